@@ -0,0 +1,23 @@
+# Production server: gunicorn -c gunicorn.conf.py src.wsgi:app
+#
+# The gevent worker runs each request, including every open
+# /api/events/stream connection, on a greenlet instead of an OS thread, so
+# idle live-event clients cost a few KB each.
+
+bind = '0.0.0.0:5001'
+worker_class = 'gevent'
+# Live events fan out in-process, so all stream clients must share one worker
+workers = 1
+worker_connections = 2000
+# Load the app in the worker after gevent has patched threading and queue
+preload_app = False
+timeout = 60
+graceful_timeout = 30
+
+
+def post_worker_init(worker):
+    from src.utils.events import cooperative_streams
+    if not cooperative_streams():
+        raise RuntimeError('gevent did not patch threading before the app loaded; '
+                           'live event streams would each hold an OS thread')
+    worker.log.info('Event streams are cooperative (gevent)')
@@ -3,7 +3,7 @@ import sys
 # DON'T CHANGE THIS !!!
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
-from flask import Flask, send_from_directory
+from flask import Flask, send_file
 from flask_cors import CORS
 from src.models.user import db
 from src.routes.user import user_bp
@@ -13,6 +13,23 @@ from src.routes.tool import tool_bp
 from src.routes.staff import staff_bp
 from src.routes.dashboard import dashboard_bp
 from src.routes.service_provider import service_provider_bp
+from src.routes.changes import changes_bp
+from src.routes.events import events_bp
+from src.routes.location import location_bp
+from src.utils.schema import upgrade_schema
+from src.utils.counters import reconcile_counters, start_reconciler
+from src.utils.locations import backfill_location_ids, reconcile_location_counts
+from src.utils.search import install_ticket_search
+from src.utils.asset_index import warm_asset_index
+from src.utils.asset_import import import_assets_command
+from src.utils.maintenance import start_maintenance_scheduler
+from src.utils.overdue import sweeper
+from src.utils.activity import backfill_activity_log
+from src.utils.service_capacity import backfill_schedule_intervals
+from src.utils.provider_metrics import backfill_metric_samples
+from src.utils.compression import init_compression
+from src.utils.json_provider import init_json
+from src.utils.static_manifest import static_manifest
 
 # SQL Server configuration
 app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
@@ -23,6 +40,12 @@ app.config['SECRET_KEY'] = 'asdf#FGSgvasgf$5$WGT'
 # Enable CORS for all routes
 CORS(app)
 
+# Encode JSON with orjson when it is installed
+init_json(app)
+
+# CLI commands
+app.cli.add_command(import_assets_command)
+
 # Register blueprints
 app.register_blueprint(user_bp, url_prefix='/api')
 app.register_blueprint(ticket_bp, url_prefix='/api')
@@ -31,31 +54,66 @@ app.register_blueprint(tool_bp, url_prefix='/api')
 app.register_blueprint(staff_bp, url_prefix='/api')
 app.register_blueprint(dashboard_bp, url_prefix='/api')
 app.register_blueprint(service_provider_bp, url_prefix='/api')
+app.register_blueprint(changes_bp, url_prefix='/api')
+app.register_blueprint(events_bp, url_prefix='/api')
+app.register_blueprint(location_bp, url_prefix='/api')
 
 # Database configuration
 app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(os.path.dirname(__file__), 'database', 'app.db')}"
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+app.config['DASHBOARD_RECONCILE_SECONDS'] = 300
+app.config['ASSET_INDEX_SIZE'] = 50000
+app.config['ASSET_INDEX_TTL'] = 300
+app.config['MAINTENANCE_INTERVAL_SECONDS'] = 3600
+app.config['MAINTENANCE_LEAD_DAYS'] = 7
+app.config['TOOL_LOAN_HOURS'] = 24
+app.config['OVERDUE_RELOAD_SECONDS'] = 300
+app.config['EVENT_STREAM_THREAD_LIMIT'] = 32  # only applies when not running under gevent
 db.init_app(app)
 
 # Create all database tables
 with app.app_context():
     db.create_all()
+    upgrade_schema(db.engine, db.metadata)
+    install_ticket_search(db.engine)
+    backfill_activity_log()
+    backfill_schedule_intervals()
+    backfill_metric_samples()
+    # Before the reconciler below, so existing rows count towards the location tree
+    backfill_location_ids()
+
+# Rebuild the dashboard and location counters and keep correcting any drift
+start_reconciler(app, app.config['DASHBOARD_RECONCILE_SECONDS'],
+                 jobs=(reconcile_counters, reconcile_location_counts))
+
+# Warm the barcode scan cache
+warm_asset_index(app)
+
+# Raise preventive-maintenance tickets as inspections and warranties come due
+start_maintenance_scheduler(app, app.config['MAINTENANCE_INTERVAL_SECONDS'])
+
+# Flag checked-out tools the moment they go overdue
+sweeper.start(app, app.config['OVERDUE_RELOAD_SECONDS'])
+
+# Compress large API responses and serve the frontend from precompressed copies
+init_compression(app)
+static_manifest.build(app.static_folder)
 
 @app.route('/', defaults={'path': ''})
 @app.route('/<path:path>')
 def serve(path):
-    static_folder_path = app.static_folder
-    if static_folder_path is None:
+    if app.static_folder is None:
             return "Static folder not configured", 404
 
-    if path != "" and os.path.exists(os.path.join(static_folder_path, path)):
-        return send_from_directory(static_folder_path, path)
-    index_path = os.path.join(static_folder_path, 'index.html')
-    return (
-        send_from_directory(static_folder_path, 'index.html')
-        if os.path.exists(index_path)
-        else ("index.html not found", 404)
-    )
+    # The manifest already knows every file, so no filesystem check per request
+    if path in static_manifest.large:
+        return send_file(static_manifest.large[path])
+    static_file, immutable = static_manifest.lookup(path) if path != "" else (None, False)
+    if static_file is None:
+        static_file, immutable = static_manifest.lookup('index.html')
+    if static_file is None:
+        return "index.html not found", 404
+    return static_manifest.respond(static_file, immutable)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,37 @@
+from datetime import datetime
+from src.models.user import db
+
+class ActivityLog(db.Model):
+    __tablename__ = 'activity_log'
+    __table_args__ = (
+        # One index per feed shape: everything, by entity, by user
+        db.Index('ix_activity_log_created_at_id', 'created_at', 'id'),
+        db.Index('ix_activity_log_entity_created_at_id', 'entity', 'created_at', 'id'),
+        db.Index('ix_activity_log_user_created_at_id', 'user_id', 'created_at', 'id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    activity_type = db.Column(db.String(50), nullable=False)  # ticket_created, tool_checkout, provider_activity, etc.
+    entity = db.Column(db.String(20), nullable=False)  # ticket, asset, tool, service_provider
+    entity_id = db.Column(db.Integer, nullable=True)
+    description = db.Column(db.String(300), nullable=False)
+    user_id = db.Column(db.Integer, nullable=True)
+    user_name = db.Column(db.String(80), nullable=True)  # copied at write time so the feed needs no join
+    provider_id = db.Column(db.Integer, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<ActivityLog {self.activity_type} {self.entity}:{self.entity_id}>'
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'type': self.activity_type,
+            'entity': self.entity,
+            'entity_id': self.entity_id,
+            'description': self.description,
+            'user_id': self.user_id,
+            'user': self.user_name or 'Unknown',
+            'provider_id': self.provider_id,
+            'timestamp': self.created_at.isoformat() if self.created_at else None
+        }
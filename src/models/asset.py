@@ -1,23 +1,45 @@
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
+from sqlalchemy.orm import selectinload
 from src.models.user import db
 
 class Asset(db.Model):
+    __table_args__ = (
+        # Backs keyset pagination on (created_at, id)
+        db.Index('ix_asset_created_at_id', 'created_at', 'id'),
+        # Backs the "expected here but not scanned" audit lookup
+        db.Index('ix_asset_location', 'location'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     asset_tag = db.Column(db.String(50), unique=True, nullable=False)
     name = db.Column(db.String(200), nullable=False)
     description = db.Column(db.Text, nullable=True)
     category = db.Column(db.String(50), nullable=True)
     location = db.Column(db.String(100), nullable=True)
+    location_id = db.Column(db.Integer, db.ForeignKey('locations.id'), nullable=True, index=True)  # resolved from location
     condition = db.Column(db.String(20), nullable=False, default='good')  # good, fair, needs_repair, broken
     purchase_date = db.Column(db.Date, nullable=True)
-    warranty_expiry = db.Column(db.Date, nullable=True)
+    warranty_expiry = db.Column(db.Date, nullable=True, index=True)
+    inspection_due = db.Column(db.Date, nullable=True, index=True)
     assigned_to = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1', onupdate=db.text('version + 1'))
 
     # Relationships
     assignee = db.relationship('User', backref='assigned_assets')
+    location_node = db.relationship('Location')
+
+    @classmethod
+    def user_options(cls):
+        """Loader options that batch-load the users read by to_dict"""
+        return (selectinload(cls.assignee),)
+
+    @classmethod
+    def with_users(cls):
+        """Query that batch-loads the users read by to_dict"""
+        return cls.query.options(*cls.user_options())
 
     def __repr__(self):
         return f'<Asset {self.asset_tag}: {self.name}>'
@@ -30,12 +52,15 @@ class Asset(db.Model):
             'description': self.description,
             'category': self.category,
             'location': self.location,
+            'location_id': self.location_id,
             'condition': self.condition,
             'purchase_date': self.purchase_date.isoformat() if self.purchase_date else None,
             'warranty_expiry': self.warranty_expiry.isoformat() if self.warranty_expiry else None,
+            'inspection_due': self.inspection_due.isoformat() if self.inspection_due else None,
             'assigned_to': self.assigned_to,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None,
+            'version': self.version,
             'assignee_name': self.assignee.username if self.assignee else None
         }
 
@@ -0,0 +1,14 @@
+from datetime import datetime
+from src.models.user import db
+
+class ChangeLog(db.Model):
+    __tablename__ = 'change_log'
+
+    id = db.Column(db.Integer, primary_key=True)  # doubles as the feed cursor
+    entity = db.Column(db.String(20), nullable=False)  # ticket, asset, tool
+    entity_id = db.Column(db.Integer, nullable=False)
+    action = db.Column(db.String(10), nullable=False)  # create, update, delete
+    changed_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<ChangeLog {self.id}: {self.action} {self.entity} {self.entity_id}>'
@@ -0,0 +1,13 @@
+from datetime import datetime
+from src.models.user import db
+
+class DashboardCounter(db.Model):
+    __tablename__ = 'dashboard_counters'
+
+    metric = db.Column(db.String(50), primary_key=True)  # ticket_by_status, asset_by_condition, etc.
+    bucket = db.Column(db.String(50), primary_key=True)  # the grouped value, e.g. 'open'
+    count = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<DashboardCounter {self.metric}:{self.bucket}={self.count}>'
@@ -0,0 +1,36 @@
+from datetime import datetime
+from src.models.user import db
+
+class Location(db.Model):
+    __tablename__ = 'locations'
+
+    id = db.Column(db.Integer, primary_key=True)
+    parent_id = db.Column(db.Integer, db.ForeignKey('locations.id'), nullable=True)
+    name = db.Column(db.String(100), nullable=False)
+    # Materialized path of lowercased names, e.g. '/main building/1st floor/'.
+    # A subtree is the contiguous index range starting at its path.
+    path = db.Column(db.String(400), unique=True, nullable=False)
+    depth = db.Column(db.Integer, nullable=False, default=0)  # 0 = building, 1 = floor, 2 = room/area
+    # Subtree totals, maintained on write and reconciled periodically
+    asset_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    ticket_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    tool_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    parent = db.relationship('Location', remote_side=[id], backref='children')
+
+    def __repr__(self):
+        return f'<Location {self.path}>'
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'parent_id': self.parent_id,
+            'name': self.name,
+            'path': self.path,
+            'depth': self.depth,
+            'asset_count': self.asset_count,
+            'ticket_count': self.ticket_count,
+            'tool_count': self.tool_count,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
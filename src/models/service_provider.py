@@ -1,8 +1,15 @@
+from sqlalchemy.orm import selectinload
 from src.models.user import db
 from datetime import datetime
 
+RECENT_ACTIVITY_COUNT = 5
+
 class ServiceProvider(db.Model):
     __tablename__ = 'service_providers'
+    __table_args__ = (
+        # Backs keyset pagination on (created_at, id)
+        db.Index('ix_service_providers_created_at_id', 'created_at', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
@@ -14,15 +21,46 @@ class ServiceProvider(db.Model):
     contact_email = db.Column(db.String(100))
     operating_hours = db.Column(db.String(100))
     status = db.Column(db.String(20), default='active')  # active, inactive, suspended
+    max_concurrent_jobs = db.Column(db.Integer, nullable=False, default=1, server_default='1')
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1', onupdate=db.text('version + 1'))
     
     # Relationships
     services = db.relationship('ProviderService', backref='provider', lazy=True, cascade='all, delete-orphan')
     metrics = db.relationship('ProviderMetric', backref='provider', lazy=True, cascade='all, delete-orphan')
     activities = db.relationship('ProviderActivity', backref='provider', lazy=True, cascade='all, delete-orphan')
-    
-    def to_dict(self):
+
+    @classmethod
+    def detail_options(cls):
+        """Loader options that batch-load the services and metrics read by to_dict"""
+        return (selectinload(cls.services), selectinload(cls.metrics))
+
+    @classmethod
+    def with_details(cls):
+        """Query that batch-loads the services and metrics read by to_dict"""
+        return cls.query.options(*cls.detail_options())
+
+    def to_summary_dict(self):
+        """Lean representation for listings, without nested collections"""
+        return {
+            'id': self.id,
+            'name': self.name,
+            'code': self.code,
+            'tagline': self.tagline,
+            'icon': self.icon,
+            'status': self.status,
+            'operating_hours': self.operating_hours,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
+            'version': self.version
+        }
+
+    def to_dict(self, recent_activities=None):
+        # Listings pass in activities fetched for the whole page; a lone
+        # provider fetches only its own latest few
+        if recent_activities is None:
+            recent_activities = ProviderActivity.latest_for([self.id]).get(self.id, [])
         return {
             'id': self.id,
             'name': self.name,
@@ -34,11 +72,13 @@ class ServiceProvider(db.Model):
             'contact_email': self.contact_email,
             'operating_hours': self.operating_hours,
             'status': self.status,
+            'max_concurrent_jobs': self.max_concurrent_jobs,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None,
+            'version': self.version,
             'services': [service.to_dict() for service in self.services],
             'metrics': [metric.to_dict() for metric in self.metrics],
-            'recent_activities': [activity.to_dict() for activity in self.activities[-5:]]  # Last 5 activities
+            'recent_activities': [activity.to_dict() for activity in recent_activities]
         }
 
 class ProviderService(db.Model):
@@ -61,6 +101,7 @@ class ProviderService(db.Model):
         }
 
 class ProviderMetric(db.Model):
+    """A provider metric; metric_value, current_value and recorded_at cache its latest sample"""
     __tablename__ = 'provider_metrics'
     
     id = db.Column(db.Integer, primary_key=True)
@@ -69,7 +110,13 @@ class ProviderMetric(db.Model):
     metric_value = db.Column(db.String(50), nullable=False)
     metric_type = db.Column(db.String(20), default='text')  # text, percentage, number, currency
     display_order = db.Column(db.Integer, default=0)
+    current_value = db.Column(db.Float, nullable=True)  # numeric types only
+    recorded_at = db.Column(db.DateTime, nullable=True)  # when current_value was sampled
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    # Relationships
+    samples = db.relationship('MetricSample', backref='metric', lazy=True, cascade='all, delete-orphan')
+    rollups = db.relationship('MetricRollup', backref='metric', lazy=True, cascade='all, delete-orphan')
     
     def to_dict(self):
         return {
@@ -78,11 +125,53 @@ class ProviderMetric(db.Model):
             'metric_value': self.metric_value,
             'metric_type': self.metric_type,
             'display_order': self.display_order,
+            'current_value': self.current_value,
+            'recorded_at': self.recorded_at.isoformat() if self.recorded_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
 
+class MetricSample(db.Model):
+    """One reading of a numeric provider metric; rows are only ever appended"""
+    __tablename__ = 'provider_metric_samples'
+
+    # The composite key is the only index, so a sample costs one narrow row
+    metric_id = db.Column(db.Integer, db.ForeignKey('provider_metrics.id'), primary_key=True)
+    recorded_at = db.Column(db.DateTime, primary_key=True)
+    value = db.Column(db.Float, nullable=False)
+
+    def to_dict(self):
+        return {
+            'recorded_at': self.recorded_at.isoformat() if self.recorded_at else None,
+            'value': self.value
+        }
+
+class MetricRollup(db.Model):
+    """Pre-aggregated samples of one metric over an hour, day or month"""
+    __tablename__ = 'provider_metric_rollups'
+
+    metric_id = db.Column(db.Integer, db.ForeignKey('provider_metrics.id'), primary_key=True)
+    resolution = db.Column(db.String(5), primary_key=True)  # hour, day, month
+    bucket_start = db.Column(db.DateTime, primary_key=True)
+    sample_count = db.Column(db.Integer, nullable=False, default=0)
+    total = db.Column(db.Float, nullable=False, default=0)
+    minimum = db.Column(db.Float, nullable=True)
+    maximum = db.Column(db.Float, nullable=True)
+
+    def to_dict(self):
+        return {
+            'bucket_start': self.bucket_start.isoformat() if self.bucket_start else None,
+            'count': self.sample_count,
+            'avg': self.total / self.sample_count if self.sample_count else None,
+            'min': self.minimum,
+            'max': self.maximum
+        }
+
 class ProviderActivity(db.Model):
     __tablename__ = 'provider_activities'
+    __table_args__ = (
+        # Backs the per-provider latest activities window
+        db.Index('ix_provider_activities_provider_date_id', 'provider_id', 'activity_date', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     provider_id = db.Column(db.Integer, db.ForeignKey('service_providers.id'), nullable=False)
@@ -100,14 +189,43 @@ class ProviderActivity(db.Model):
             'created_at': self.created_at.isoformat() if self.created_at else None
         }
 
+    @classmethod
+    def latest_for(cls, provider_ids, per_provider=RECENT_ACTIVITY_COUNT):
+        """Map each provider id to its latest activities, oldest first, in one windowed query"""
+        if not provider_ids:
+            return {}
+        rank = db.func.row_number().over(
+            partition_by=cls.provider_id,
+            order_by=(cls.activity_date.desc(), cls.id.desc())
+        ).label('rank')
+        ranked = db.select(cls.id, rank).where(cls.provider_id.in_(provider_ids)).subquery()
+        activities = (
+            cls.query.join(ranked, cls.id == ranked.c.id)
+            .filter(ranked.c.rank <= per_provider)
+            .order_by(cls.provider_id, cls.activity_date, cls.id)
+            .all()
+        )
+        latest = {}
+        for activity in activities:
+            latest.setdefault(activity.provider_id, []).append(activity)
+        return latest
+
 class ServiceSchedule(db.Model):
     __tablename__ = 'service_schedules'
+    __table_args__ = (
+        # Backs the per-provider capacity check and availability range reads
+        db.Index('ix_service_schedules_provider_ends', 'provider_id', 'status', 'ends_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     provider_id = db.Column(db.Integer, db.ForeignKey('service_providers.id'), nullable=False)
     service_id = db.Column(db.Integer, db.ForeignKey('provider_services.id'), nullable=False)
     scheduled_date = db.Column(db.DateTime, nullable=False)
     scheduled_time = db.Column(db.Time, nullable=False)
+    duration_minutes = db.Column(db.Integer, nullable=False, default=60, server_default='60')
+    starts_at = db.Column(db.DateTime, nullable=True)  # scheduled_date + scheduled_time
+    ends_at = db.Column(db.DateTime, nullable=True)  # starts_at + duration_minutes; end of the last occurrence for a series, NULL if open-ended
+    recurrence = db.Column(db.String(200), nullable=True)  # RRULE subset, e.g. FREQ=WEEKLY;BYDAY=MO
     special_requirements = db.Column(db.Text)
     status = db.Column(db.String(20), default='scheduled')  # scheduled, in_progress, completed, cancelled
     requested_by = db.Column(db.Integer)  # Reference to user ID (simplified)
@@ -117,6 +235,7 @@ class ServiceSchedule(db.Model):
     # Relationships
     provider = db.relationship('ServiceProvider', backref='schedules')
     service = db.relationship('ProviderService', backref='schedules')
+    exceptions = db.relationship('ScheduleException', backref='schedule', lazy=True, cascade='all, delete-orphan')
     
     def to_dict(self):
         return {
@@ -125,6 +244,10 @@ class ServiceSchedule(db.Model):
             'service_id': self.service_id,
             'scheduled_date': self.scheduled_date.isoformat() if self.scheduled_date else None,
             'scheduled_time': self.scheduled_time.isoformat() if self.scheduled_time else None,
+            'duration_minutes': self.duration_minutes,
+            'starts_at': self.starts_at.isoformat() if self.starts_at else None,
+            'ends_at': self.ends_at.isoformat() if self.ends_at else None,
+            'recurrence': self.recurrence,
             'special_requirements': self.special_requirements,
             'status': self.status,
             'requested_by': self.requested_by,
@@ -132,4 +255,34 @@ class ServiceSchedule(db.Model):
             'updated_at': self.updated_at.isoformat() if self.updated_at else None,
             'provider_name': self.provider.name if self.provider else None,
             'service_name': self.service.name if self.service else None
-        }
\ No newline at end of file
+        }
+
+class ScheduleException(db.Model):
+    """A change to one occurrence of a recurring schedule; untouched occurrences have no row"""
+    __tablename__ = 'schedule_exceptions'
+    __table_args__ = (
+        db.Index('ix_schedule_exceptions_schedule_occurrence', 'schedule_id', 'occurrence_start', unique=True),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    schedule_id = db.Column(db.Integer, db.ForeignKey('service_schedules.id'), nullable=False)
+    occurrence_start = db.Column(db.DateTime, nullable=False)  # the start the rule generated
+    status = db.Column(db.String(20), nullable=True)  # overrides the series status: cancelled, completed, etc.
+    starts_at = db.Column(db.DateTime, nullable=True)  # set when the occurrence was moved
+    ends_at = db.Column(db.DateTime, nullable=True)
+    notes = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'schedule_id': self.schedule_id,
+            'occurrence_start': self.occurrence_start.isoformat() if self.occurrence_start else None,
+            'status': self.status,
+            'starts_at': self.starts_at.isoformat() if self.starts_at else None,
+            'ends_at': self.ends_at.isoformat() if self.ends_at else None,
+            'notes': self.notes,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
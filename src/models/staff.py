@@ -3,6 +3,11 @@ from datetime import datetime
 from src.models.user import db
 
 class Staff(db.Model):
+    __table_args__ = (
+        # Backs keyset pagination on (created_at, id)
+        db.Index('ix_staff_created_at_id', 'created_at', 'id'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     employee_id = db.Column(db.String(50), unique=True, nullable=False)
     name = db.Column(db.String(200), nullable=False)
@@ -13,6 +18,7 @@ class Staff(db.Model):
     status = db.Column(db.String(20), nullable=False, default='active')  # active, inactive
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1', onupdate=db.text('version + 1'))
 
     def __repr__(self):
         return f'<Staff {self.employee_id}: {self.name}>'
@@ -28,6 +34,7 @@ class Staff(db.Model):
             'phone': self.phone,
             'status': self.status,
             'created_at': self.created_at.isoformat() if self.created_at else None,
-            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
+            'version': self.version
         }
 
@@ -0,0 +1,12 @@
+from datetime import datetime
+from src.models.user import db
+
+class TableVersion(db.Model):
+    __tablename__ = 'table_versions'
+
+    table_name = db.Column(db.String(64), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)  # bumped once per committed transaction that wrote the table
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<TableVersion {self.table_name}={self.version}>'
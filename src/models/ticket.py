@@ -1,8 +1,17 @@
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
+from sqlalchemy.orm import selectinload
 from src.models.user import db
 
 class Ticket(db.Model):
+    __table_args__ = (
+        # Backs keyset pagination on (created_at, id)
+        db.Index('ix_ticket_created_at_id', 'created_at', 'id'),
+        # One auto-raised ticket per source event; NULL for hand-raised tickets
+        db.Index('ix_ticket_dedupe_key', 'dedupe_key', unique=True,
+                 mssql_where=db.text('dedupe_key IS NOT NULL')),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
     description = db.Column(db.Text, nullable=True)
@@ -12,13 +21,28 @@ class Ticket(db.Model):
     assigned_to = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
     created_by = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     location = db.Column(db.String(100), nullable=True)
+    location_id = db.Column(db.Integer, db.ForeignKey('locations.id'), nullable=True, index=True)  # resolved from location
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # Bumped by every UPDATE, ORM or Core; exposed to clients as the ETag
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1', onupdate=db.text('version + 1'))
     resolved_at = db.Column(db.DateTime, nullable=True)
+    dedupe_key = db.Column(db.String(100), nullable=True)  # set on tickets raised by the maintenance scheduler
 
     # Relationships
     assignee = db.relationship('User', foreign_keys=[assigned_to], backref='assigned_tickets')
     creator = db.relationship('User', foreign_keys=[created_by], backref='created_tickets')
+    location_node = db.relationship('Location')
+
+    @classmethod
+    def user_options(cls):
+        """Loader options that batch-load the users read by to_dict"""
+        return (selectinload(cls.assignee), selectinload(cls.creator))
+
+    @classmethod
+    def with_users(cls):
+        """Query that batch-loads the users read by to_dict"""
+        return cls.query.options(*cls.user_options())
 
     def __repr__(self):
         return f'<Ticket {self.title}>'
@@ -34,8 +58,10 @@ class Ticket(db.Model):
             'assigned_to': self.assigned_to,
             'created_by': self.created_by,
             'location': self.location,
+            'location_id': self.location_id,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None,
+            'version': self.version,
             'resolved_at': self.resolved_at.isoformat() if self.resolved_at else None,
             'assignee_name': self.assignee.username if self.assignee else None,
             'creator_name': self.creator.username if self.creator else None
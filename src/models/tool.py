@@ -1,8 +1,16 @@
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
+from sqlalchemy.orm import selectinload
 from src.models.user import db
 
 class Tool(db.Model):
+    __table_args__ = (
+        # Backs keyset pagination on (created_at, id)
+        db.Index('ix_tool_created_at_id', 'created_at', 'id'),
+        # Backs the overdue listing and the sweeper's startup load
+        db.Index('ix_tool_status_expected_return', 'status', 'expected_return_at'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     tool_name = db.Column(db.String(200), nullable=False)
     tool_category = db.Column(db.String(50), nullable=True)
@@ -10,13 +18,28 @@ class Tool(db.Model):
     condition = db.Column(db.String(20), nullable=False, default='good')  # good, fair, needs_repair, broken
     status = db.Column(db.String(20), nullable=False, default='available')  # available, in_use, missing, obsolete
     location = db.Column(db.String(100), nullable=True)
+    location_id = db.Column(db.Integer, db.ForeignKey('locations.id'), nullable=True, index=True)  # resolved from location
     checked_out_to = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
     checked_out_at = db.Column(db.DateTime, nullable=True)
+    expected_return_at = db.Column(db.DateTime, nullable=True)
+    overdue_since = db.Column(db.DateTime, nullable=True)  # set by the overdue sweeper
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1', onupdate=db.text('version + 1'))
 
     # Relationships
     checked_out_user = db.relationship('User', backref='checked_out_tools')
+    location_node = db.relationship('Location')
+
+    @classmethod
+    def user_options(cls):
+        """Loader options that batch-load the users read by to_dict"""
+        return (selectinload(cls.checked_out_user),)
+
+    @classmethod
+    def with_users(cls):
+        """Query that batch-loads the users read by to_dict"""
+        return cls.query.options(*cls.user_options())
 
     def __repr__(self):
         return f'<Tool {self.tool_name}>'
@@ -30,10 +53,51 @@ class Tool(db.Model):
             'condition': self.condition,
             'status': self.status,
             'location': self.location,
+            'location_id': self.location_id,
             'checked_out_to': self.checked_out_to,
             'checked_out_at': self.checked_out_at.isoformat() if self.checked_out_at else None,
+            'expected_return_at': self.expected_return_at.isoformat() if self.expected_return_at else None,
+            'overdue_since': self.overdue_since.isoformat() if self.overdue_since else None,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None,
+            'version': self.version,
             'checked_out_user_name': self.checked_out_user.username if self.checked_out_user else None
         }
 
+
+class ToolReservation(db.Model):
+    __tablename__ = 'tool_reservations'
+    __table_args__ = (
+        # Backs the per-tool overlap check and calendar loads
+        db.Index('ix_tool_reservations_tool_ends', 'tool_id', 'status', 'ends_at'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    tool_id = db.Column(db.Integer, db.ForeignKey('tool.id'), nullable=False)
+    reserved_by = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    starts_at = db.Column(db.DateTime, nullable=False)
+    ends_at = db.Column(db.DateTime, nullable=False)
+    purpose = db.Column(db.String(200), nullable=True)
+    status = db.Column(db.String(20), nullable=False, default='active')  # active, cancelled
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    # Relationships
+    tool = db.relationship('Tool', backref='reservations')
+    reserver = db.relationship('User')
+
+    def __repr__(self):
+        return f'<ToolReservation {self.tool_id}: {self.starts_at} - {self.ends_at}>'
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'tool_id': self.tool_id,
+            'reserved_by': self.reserved_by,
+            'starts_at': self.starts_at.isoformat() if self.starts_at else None,
+            'ends_at': self.ends_at.isoformat() if self.ends_at else None,
+            'purpose': self.purpose,
+            'status': self.status,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
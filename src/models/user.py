@@ -5,6 +5,11 @@ from datetime import datetime
 db = SQLAlchemy()
 
 class User(db.Model):
+    __table_args__ = (
+        # Backs keyset pagination on (created_at, id)
+        db.Index('ix_user_created_at_id', 'created_at', 'id'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(80), unique=True, nullable=False)
     email = db.Column(db.String(120), unique=True, nullable=False)
@@ -1,18 +1,36 @@
 from datetime import timezone
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, abort, jsonify, request
+from werkzeug.exceptions import HTTPException
 from src.models.asset import Asset, db
-from datetime import datetime
+from src.utils.asset_index import asset_index
+from src.utils.asset_import import ImportAborted, import_assets, read_rows
+from src.utils.pagination import get_page_args, paginate, page_meta
+from src.utils.export import EXPORT_FORMATS, export_response
+from src.utils.maintenance import DUE_KINDS, due_assets, parse_window
+from src.utils.locations import resolve_location_ids, subtree_condition
+from src.utils.activity import log_activity
+from src.utils.concurrency import conditional_update, etag, if_match_version
+from src.utils.conditional import conditional_get
+from src.utils.serializers import get_layout, asset_serializer
+from src.models.user import User
+from datetime import date, datetime
 
 asset_bp = Blueprint('asset', __name__)
 
+MAX_BATCH_SCAN = 50000
+SCAN_CHUNK_SIZE = 500
+EDITABLE_FIELDS = ('asset_tag', 'name', 'description', 'category', 'location', 'condition', 'assigned_to')
+DATE_FIELDS = ('purchase_date', 'warranty_expiry', 'inspection_due')
+
 @asset_bp.route('/assets', methods=['GET'])
+@conditional_get(Asset, User)
 def get_assets():
-    """Get all assets with optional filtering"""
+    """Get a page of assets with optional filtering"""
     category = request.args.get('category')
     condition = request.args.get('condition')
     location = request.args.get('location')
     
-    query = Asset.query
+    query = asset_serializer.query()
     
     if category:
         query = query.filter(Asset.category == category)
@@ -21,13 +39,60 @@ def get_assets():
     if location:
         query = query.filter(Asset.location == location)
     
-    assets = query.order_by(Asset.created_at.desc()).all()
+    try:
+        subtree = subtree_condition(Asset, request.args)
+    except (LookupError, ValueError) as e:
+        return jsonify({
+            'success': False,
+            'data': None,
+            'message': 'Invalid location filter',
+            'errors': [str(e)]
+        }), 400
+    if subtree is not None:
+        query = query.filter(subtree)
+
+    try:
+        limit, after = get_page_args(request.args)
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'data': None,
+            'message': 'Invalid pagination parameters',
+            'errors': [str(e)]
+        }), 400
+
+    try:
+        layout = get_layout(request.args)
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'data': None,
+            'message': 'Invalid layout',
+            'errors': [str(e)]
+        }), 400
+
+    # Serialized from result rows; layout=columnar returns one array per field
+    rows, next_cursor = paginate(query, Asset, limit, after)
     return jsonify({
         'success': True,
-        'data': [asset.to_dict() for asset in assets],
-        'message': f'Retrieved {len(assets)} assets'
+        'data': asset_serializer.serialize(rows, layout),
+        'pagination': page_meta(limit, next_cursor),
+        'message': f'Retrieved {len(rows)} assets'
     })
 
+@asset_bp.route('/assets/export', methods=['GET'])
+def export_assets():
+    """Stream every asset as CSV or NDJSON"""
+    fmt = request.args.get('format', 'csv')
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({
+            'success': False,
+            'data': None,
+            'message': 'Invalid export format',
+            'errors': [f"format must be one of {', '.join(EXPORT_FORMATS)}"]
+        }), 400
+    return export_response(Asset, 'assets', fmt, use_gzip=request.args.get('gzip') in ('1', 'true'))
+
 @asset_bp.route('/assets', methods=['POST'])
 def create_asset():
     """Create a new asset"""
@@ -43,17 +108,22 @@ def create_asset():
             condition=data.get('condition', 'good'),
             purchase_date=datetime.strptime(data['purchase_date'], '%Y-%m-%d').date() if data.get('purchase_date') else None,
             warranty_expiry=datetime.strptime(data['warranty_expiry'], '%Y-%m-%d').date() if data.get('warranty_expiry') else None,
+            inspection_due=datetime.strptime(data['inspection_due'], '%Y-%m-%d').date() if data.get('inspection_due') else None,
             assigned_to=data.get('assigned_to')
         )
         
         db.session.add(asset)
+        db.session.flush()
+        log_activity('asset_created', 'asset', asset.id, f'Asset registered: {asset.name} ({asset.asset_tag})',
+                     user_id=asset.assigned_to)
         db.session.commit()
+        asset_index.put(asset.to_dict())
         
         return jsonify({
             'success': True,
             'data': asset.to_dict(),
             'message': 'Asset created successfully'
-        }), 201
+        }), 201, {'ETag': etag(asset.version)}
         
     except Exception as e:
         return jsonify({
@@ -63,6 +133,74 @@ def create_asset():
             'errors': [str(e)]
         }), 400
 
+@asset_bp.route('/assets/import', methods=['POST'])
+def import_assets_file():
+    """Import assets from an uploaded CSV or XLSX audit template"""
+    upload = request.files.get('file')
+    if upload is None or not upload.filename:
+        return jsonify({
+            'success': False,
+            'data': None,
+            'message': 'Failed to import assets',
+            'errors': ['A CSV or XLSX file is required']
+        }), 400
+
+    try:
+        summary = import_assets(read_rows(upload.stream, upload.filename))
+        return jsonify({
+            'success': True,
+            'data': summary,
+            'message': f"Imported {summary['created'] + summary['updated']} of {summary['processed']} rows"
+        })
+
+    except ImportAborted as e:
+        # Earlier batches are committed; report them alongside the failure
+        summary = e.summary
+        return jsonify({
+            'success': False,
+            'data': summary,
+            'message': f"Import stopped after {summary['created'] + summary['updated']} rows were saved",
+            'errors': [str(e)]
+        }), 400
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({
+            'success': False,
+            'data': None,
+            'message': 'Failed to import assets',
+            'errors': [str(e)]
+        }), 400
+
+@asset_bp.route('/assets/due', methods=['GET'])
+def get_due_assets():
+    """Get assets with inspections or warranty expiries coming due"""
+    try:
+        window = parse_window(request.args.get('within'))
+        kinds = [kind for kind in request.args.get('kind', ','.join(DUE_KINDS)).split(',') if kind]
+        unknown = [kind for kind in kinds if kind not in DUE_KINDS]
+        if unknown:
+            raise ValueError(f"Unknown kind: {', '.join(unknown)}")
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'data': None,
+            'message': 'Invalid due-date query',
+            'errors': [str(e)]
+        }), 400
+
+    today = date.today()
+    start = date.min if request.args.get('overdue') in ('1', 'true') else today
+    items = due_assets(start, today + window, kinds)
+    return jsonify({
+        'success': True,
+        'data': [
+            {'kind': kind, 'due_date': due_date.isoformat(), 'overdue': due_date < today, 'asset': asset.to_dict()}
+            for due_date, kind, asset in items
+        ],
+        'message': f'Retrieved {len(items)} due items'
+    })
+
 @asset_bp.route('/assets/<int:asset_id>', methods=['GET'])
 def get_asset(asset_id):
     """Get a specific asset by ID"""
@@ -71,38 +209,64 @@ def get_asset(asset_id):
         'success': True,
         'data': asset.to_dict(),
         'message': 'Asset retrieved successfully'
-    })
+    }), 200, {'ETag': etag(asset.version)}
 
 @asset_bp.route('/assets/<int:asset_id>', methods=['PUT'])
 def update_asset(asset_id):
-    """Update an asset"""
+    """Update an asset if it is still at the version named by If-Match"""
     try:
-        asset = Asset.query.get_or_404(asset_id)
-        data = request.json
+        version = if_match_version(request.headers)
+    except LookupError as e:
+        return jsonify({
+            'success': False,
+            'data': None,
+            'message': 'Failed to update asset',
+            'errors': [str(e)]
+        }), 428
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'data': None,
+            'message': 'Failed to update asset',
+            'errors': [str(e)]
+        }), 400
 
-        asset.asset_tag = data.get('asset_tag', asset.asset_tag)
-        asset.name = data.get('name', asset.name)
-        asset.description = data.get('description', asset.description)
-        asset.category = data.get('category', asset.category)
-        asset.location = data.get('location', asset.location)
-        asset.condition = data.get('condition', asset.condition)
-        asset.assigned_to = data.get('assigned_to', asset.assigned_to)
-        asset.updated_at = datetime.now(timezone.utc)
+    try:
+        data = request.json
+        values = {field: data[field] for field in EDITABLE_FIELDS if field in data}
+        values['updated_at'] = datetime.now(timezone.utc)
+        for field in DATE_FIELDS:
+            if data.get(field):
+                values[field] = datetime.strptime(data[field], '%Y-%m-%d').date()
+        # conditional_update moves the location subtree counts along with the row
+        if 'location' in values:
+            values['location_id'] = resolve_location_ids(db.session, [values['location']]).get(values['location'])
 
-        if data.get('purchase_date'):
-            asset.purchase_date = datetime.strptime(data['purchase_date'], '%Y-%m-%d').date()
-        if data.get('warranty_expiry'):
-            asset.warranty_expiry = datetime.strptime(data['warranty_expiry'], '%Y-%m-%d').date()
+        asset, current_version = conditional_update(Asset, asset_id, version, values)
+        if asset is None:
+            if current_version is None:
+                abort(404)
+            return jsonify({
+                'success': False,
+                'data': {'current_version': current_version},
+                'message': 'Asset was changed by another request',
+                'errors': ['If-Match does not match the current version']
+            }), 412, {'ETag': etag(current_version)}
 
+        log_activity('asset_updated', 'asset', asset.id, f'Asset updated: {asset.name} ({asset.asset_tag})')
         db.session.commit()
+        asset_index.put(asset.to_dict())
 
         return jsonify({
             'success': True,
             'data': asset.to_dict(),
             'message': 'Asset updated successfully'
-        })
+        }), 200, {'ETag': etag(asset.version)}
 
+    except HTTPException:
+        raise
     except Exception as e:
+        db.session.rollback()
         return jsonify({
             'success': False,
             'data': None,
@@ -115,6 +279,7 @@ def delete_asset(asset_id):
     """Delete an asset"""
     try:
         asset = Asset.query.get_or_404(asset_id)
+        log_activity('asset_deleted', 'asset', asset.id, f'Asset removed: {asset.name} ({asset.asset_tag})')
         db.session.delete(asset)
         db.session.commit()
         
@@ -135,10 +300,18 @@ def delete_asset(asset_id):
 @asset_bp.route('/assets/scan/<string:barcode>', methods=['GET'])
 def scan_asset(barcode):
     """Get asset by barcode/asset tag"""
-    if asset := Asset.query.filter_by(asset_tag=barcode).first():
+    if data := asset_index.get(barcode):
         return jsonify({
             'success': True,
-            'data': asset.to_dict(),
+            'data': data,
+            'message': 'Asset found successfully'
+        })
+    if asset := Asset.with_users().filter_by(asset_tag=barcode).first():
+        data = asset.to_dict()
+        asset_index.put(data)
+        return jsonify({
+            'success': True,
+            'data': data,
             'message': 'Asset found successfully'
         })
     else:
@@ -147,4 +320,67 @@ def scan_asset(barcode):
             'data': None,
             'message': 'Asset not found',
             'errors': ['No asset found with this barcode']
-        }), 404
\ No newline at end of file
+        }), 404
+
+@asset_bp.route('/assets/scan/batch', methods=['POST'])
+def scan_assets_batch():
+    """Resolve a stock-take sweep of barcodes in one request"""
+    data = request.json or {}
+    barcodes = data.get('barcodes')
+    location = data.get('location')
+
+    if not isinstance(barcodes, list):
+        return jsonify({
+            'success': False,
+            'data': None,
+            'message': 'Failed to scan assets',
+            'errors': ['barcodes must be a list']
+        }), 400
+    if len(barcodes) > MAX_BATCH_SCAN:
+        return jsonify({
+            'success': False,
+            'data': None,
+            'message': 'Failed to scan assets',
+            'errors': [f'At most {MAX_BATCH_SCAN} barcodes are allowed per request']
+        }), 400
+
+    try:
+        # De-duplicate repeat scans, keeping first-scan order
+        barcodes = list(dict.fromkeys(str(barcode) for barcode in barcodes))
+
+        found = {}
+        misses = []
+        for barcode in barcodes:
+            if cached := asset_index.get(barcode):
+                found[barcode] = cached
+            else:
+                misses.append(barcode)
+
+        for start in range(0, len(misses), SCAN_CHUNK_SIZE):
+            chunk = misses[start:start + SCAN_CHUNK_SIZE]
+            for asset in Asset.with_users().filter(Asset.asset_tag.in_(chunk)).all():
+                found[asset.asset_tag] = asset.to_dict()
+                asset_index.put(found[asset.asset_tag])
+
+        not_scanned = []
+        if location:
+            expected = Asset.with_users().filter(Asset.location == location).all()
+            not_scanned = [asset.to_dict() for asset in expected if asset.asset_tag not in found]
+
+        return jsonify({
+            'success': True,
+            'data': {
+                'found': [found[barcode] for barcode in barcodes if barcode in found],
+                'unknown': [barcode for barcode in barcodes if barcode not in found],
+                'not_scanned': not_scanned
+            },
+            'message': f'Matched {len(found)} of {len(barcodes)} barcodes'
+        })
+
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'data': None,
+            'message': 'Failed to scan assets',
+            'errors': [str(e)]
+        }), 400
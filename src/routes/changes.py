@@ -0,0 +1,61 @@
+from flask import Blueprint, jsonify, request
+from src.models.change_log import ChangeLog
+from src.utils.changes import TRACKED_ENTITIES
+from src.utils.pagination import get_limit
+
+changes_bp = Blueprint('changes', __name__)
+
+@changes_bp.route('/changes', methods=['GET'])
+def get_changes():
+    """Get tickets, assets and tools changed since a feed cursor"""
+    try:
+        limit = get_limit(request.args)
+        since = int(request.args.get('since', 0))
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'data': None,
+            'message': 'Invalid change feed parameters',
+            'errors': [str(e)]
+        }), 400
+
+    entries = (ChangeLog.query
+               .filter(ChangeLog.id > since)
+               .order_by(ChangeLog.id)
+               .limit(limit + 1)
+               .all())
+    has_more = len(entries) > limit
+    entries = entries[:limit]
+
+    # Collapse repeated changes to the same row into its latest entry
+    latest = {}
+    for entry in entries:
+        latest[(entry.entity, entry.entity_id)] = entry
+
+    # Load the surviving rows with one query per entity
+    live = {}
+    for entity, model in TRACKED_ENTITIES.items():
+        ids = [entity_id for (name, entity_id), entry in latest.items() if name == entity and entry.action != 'delete']
+        if ids:
+            for row in model.with_users().filter(model.id.in_(ids)).all():
+                live[(entity, row.id)] = row
+
+    changes = []
+    for key, entry in sorted(latest.items(), key=lambda item: item[1].id):
+        row = live.get(key)
+        changes.append({
+            'seq': entry.id,
+            'entity': entry.entity,
+            'id': entry.entity_id,
+            'action': entry.action if row is not None else 'delete',
+            'changed_at': entry.changed_at.isoformat() if entry.changed_at else None,
+            'data': row.to_dict() if row is not None else None
+        })
+
+    return jsonify({
+        'success': True,
+        'data': changes,
+        'cursor': str(entries[-1].id if entries else since),
+        'has_more': has_more,
+        'message': f'Retrieved {len(changes)} changes'
+    })
@@ -1,60 +1,42 @@
-from flask import Blueprint, jsonify
+from flask import Blueprint, jsonify, request
 from src.models.ticket import Ticket
-from src.models.asset import Asset
-from src.models.tool import Tool
-from src.models.staff import Staff
-from src.models.user import db
-from sqlalchemy import func
+from src.models.activity import ActivityLog
+from src.models.user import User
+from src.models.dashboard_counter import DashboardCounter
+from src.utils.counters import read_counters
+from src.utils.conditional import conditional_get
+from src.utils.serializers import ticket_serializer
+from src.utils.pagination import get_page_args, paginate, page_meta
 
 dashboard_bp = Blueprint('dashboard', __name__)
 
+RECENT_ACTIVITY_LIMIT = 10
+
 @dashboard_bp.route('/dashboard/stats', methods=['GET'])
+@conditional_get(DashboardCounter)
 def get_dashboard_stats():
     """Get dashboard statistics"""
     try:
-        # Get counts
-        total_tickets = Ticket.query.count()
-        active_assets = Asset.query.filter(Asset.condition != 'broken').count()
-        total_tools = Tool.query.count()
-        total_staff = Staff.query.filter(Staff.status == 'active').count()
-        
-        # Get ticket stats by status
-        ticket_stats = db.session.query(
-            Ticket.status,
-            func.count(Ticket.id).label('count')
-        ).group_by(Ticket.status).all()
-        
-        # Get ticket stats by priority
-        priority_stats = db.session.query(
-            Ticket.priority,
-            func.count(Ticket.id).label('count')
-        ).group_by(Ticket.priority).all()
-        
-        # Get asset stats by condition
-        asset_stats = db.session.query(
-            Asset.condition,
-            func.count(Asset.id).label('count')
-        ).group_by(Asset.condition).all()
-        
-        # Get tool stats by status
-        tool_stats = db.session.query(
-            Tool.status,
-            func.count(Tool.id).label('count')
-        ).group_by(Tool.status).all()
-        
+        # Counters are maintained on write, so this reads a handful of rows
+        # instead of scanning the ticket, asset, tool and staff tables
+        counters = read_counters()
+        ticket_stats = counters['ticket_by_status']
+        asset_stats = counters['asset_by_condition']
+        tool_stats = counters['tool_by_status']
+
         return jsonify({
             'success': True,
             'data': {
                 'overview': {
-                    'total_tickets': total_tickets,
-                    'active_assets': active_assets,
-                    'total_tools': total_tools,
-                    'total_staff': total_staff
+                    'total_tickets': sum(ticket_stats.values()),
+                    'active_assets': sum(count for condition, count in asset_stats.items() if condition != 'broken'),
+                    'total_tools': sum(tool_stats.values()),
+                    'total_staff': counters['staff_by_status'].get('active', 0)
                 },
-                'ticket_by_status': {stat.status: stat.count for stat in ticket_stats},
-                'ticket_by_priority': {stat.priority: stat.count for stat in priority_stats},
-                'asset_by_condition': {stat.condition: stat.count for stat in asset_stats},
-                'tool_by_status': {stat.status: stat.count for stat in tool_stats}
+                'ticket_by_status': ticket_stats,
+                'ticket_by_priority': counters['ticket_by_priority'],
+                'asset_by_condition': asset_stats,
+                'tool_by_status': tool_stats
             },
             'message': 'Dashboard statistics retrieved successfully'
         })
@@ -68,14 +50,15 @@ def get_dashboard_stats():
         }), 500
 
 @dashboard_bp.route('/dashboard/recent-tickets', methods=['GET'])
+@conditional_get(Ticket, User)
 def get_recent_tickets():
     """Get recent tickets for dashboard"""
     try:
-        recent_tickets = Ticket.query.order_by(Ticket.created_at.desc()).limit(10).all()
+        recent_tickets = ticket_serializer.query().order_by(Ticket.created_at.desc()).limit(10).all()
         
         return jsonify({
             'success': True,
-            'data': [ticket.to_dict() for ticket in recent_tickets],
+            'data': ticket_serializer.rows(recent_tickets),
             'message': f'Retrieved {len(recent_tickets)} recent tickets'
         })
         
@@ -88,45 +71,37 @@ def get_recent_tickets():
         }), 500
 
 @dashboard_bp.route('/dashboard/recent-activities', methods=['GET'])
+@conditional_get(ActivityLog)
 def get_recent_activities():
-    """Get recent activities for dashboard"""
+    """Get a page of the activity feed, optionally filtered by entity or user"""
     try:
-        # Get recent tickets
-        recent_tickets = Ticket.query.order_by(Ticket.created_at.desc()).limit(5).all()
-        activities = [
-            {
-                'type': 'ticket_created',
-                'description': f'New ticket created: {ticket.title}',
-                'timestamp': ticket.created_at.isoformat(),
-                'user': (
-                    ticket.creator.username if ticket.creator else 'Unknown'
-                ),
-            }
-            for ticket in recent_tickets
-        ]
-        # Get recently checked out tools
-        checked_out_tools = Tool.query.filter(Tool.status == 'in_use').order_by(Tool.checked_out_at.desc()).limit(5).all()
-        activities.extend(
-            {
-                'type': 'tool_checkout',
-                'description': f'Tool checked out: {tool.tool_name}',
-                'timestamp': tool.checked_out_at.isoformat(),
-                'user': (
-                    tool.checked_out_user.username
-                    if tool.checked_out_user
-                    else 'Unknown'
-                ),
-            }
-            for tool in checked_out_tools
-            if tool.checked_out_at
-        )
-        # Sort activities by timestamp
-        activities.sort(key=lambda x: x['timestamp'], reverse=True)
+        limit, after = get_page_args(request.args, default_limit=RECENT_ACTIVITY_LIMIT)
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'data': None,
+            'message': 'Invalid pagination parameters',
+            'errors': [str(e)]
+        }), 400
+
+    try:
+        # Every writer appends to the activity log, so the feed is one range
+        # read over the (entity|user_id, created_at, id) indexes
+        query = ActivityLog.query
+        entity = request.args.get('entity')
+        user_id = request.args.get('user_id', type=int)
+        if entity:
+            query = query.filter(ActivityLog.entity == entity)
+        if user_id is not None:
+            query = query.filter(ActivityLog.user_id == user_id)
+
+        activities, next_cursor = paginate(query, ActivityLog, limit, after)
 
         return jsonify({
             'success': True,
-            'data': activities[:10],  # Return top 10 activities
-            'message': f'Retrieved {len(activities[:10])} recent activities'
+            'data': [activity.to_dict() for activity in activities],
+            'pagination': page_meta(limit, next_cursor),
+            'message': f'Retrieved {len(activities)} recent activities'
         })
 
     except Exception as e:
@@ -135,4 +110,4 @@ def get_recent_activities():
             'data': None,
             'message': 'Failed to retrieve recent activities',
             'errors': [str(e)]
-        }), 500
\ No newline at end of file
+        }), 500
@@ -0,0 +1,31 @@
+from flask import Blueprint, Response, current_app, jsonify, request
+from src.utils.events import broker, cooperative_streams, stream_events
+
+events_bp = Blueprint('events', __name__)
+
+@events_bp.route('/events/stream', methods=['GET'])
+def event_stream():
+    """Stream live ticket and tool events as server-sent events"""
+    types = [t for t in request.args.get('types', '').split(',') if t]
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    try:
+        last_event_id = int(last_event_id) if last_event_id else None
+    except ValueError:
+        last_event_id = None
+
+    # Without gevent every open stream pins a server thread, so cap them
+    limit = current_app.config.get('EVENT_STREAM_THREAD_LIMIT')
+    if limit and not cooperative_streams() and broker.subscriber_count() >= limit:
+        return jsonify({
+            'success': False,
+            'data': None,
+            'message': 'Too many live event streams',
+            'errors': ['Run the server with the gevent worker (gunicorn -c gunicorn.conf.py) for more streams']
+        }), 503, {'Retry-After': '30'}
+
+    subscriber = broker.subscribe(types, last_event_id)
+    return Response(
+        stream_events(subscriber),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
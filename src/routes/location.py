@@ -0,0 +1,41 @@
+from flask import Blueprint, jsonify, request
+from src.models.location import Location
+from src.utils.locations import location_path, split_location, subtree_filter
+
+location_bp = Blueprint('location', __name__)
+
+@location_bp.route('/locations', methods=['GET'])
+def get_locations():
+    """Get location nodes with their subtree counts, optionally under a parent path"""
+    depth = request.args.get('depth', type=int)
+    parent_id = request.args.get('parent_id', type=int)
+
+    query = Location.query
+    if request.args.get('path'):
+        query = query.filter(subtree_filter(Location.path, location_path(split_location(request.args['path']))))
+    if parent_id is not None:
+        query = query.filter(Location.parent_id == parent_id)
+    if depth is not None:
+        query = query.filter(Location.depth == depth)
+
+    locations = query.order_by(Location.path).all()
+    return jsonify({
+        'success': True,
+        'data': [location.to_dict() for location in locations],
+        'message': f'Retrieved {len(locations)} locations'
+    })
+
+@location_bp.route('/locations/<int:location_id>', methods=['GET'])
+def get_location(location_id):
+    """Get a location node and its direct children"""
+    location = Location.query.get_or_404(location_id)
+    data = location.to_dict()
+    data['children'] = [
+        child.to_dict()
+        for child in Location.query.filter_by(parent_id=location.id).order_by(Location.path).all()
+    ]
+    return jsonify({
+        'success': True,
+        'data': data,
+        'message': 'Location retrieved successfully'
+    })
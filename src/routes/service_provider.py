@@ -1,25 +1,65 @@
-from flask import Blueprint, request, jsonify
-from src.models.service_provider import ServiceProvider, ProviderService, ProviderMetric, ProviderActivity, ServiceSchedule, db
-from datetime import datetime
+from flask import Blueprint, abort, request, jsonify
+from src.models.service_provider import (
+    ServiceProvider, ProviderService, ProviderMetric, ProviderActivity, ServiceSchedule, ScheduleException, db
+)
+from src.utils.pagination import get_page_args, paginate
+from src.utils.activity import log_activity
+from src.utils.concurrency import conditional_update, etag, if_match_version
+from src.utils.conditional import conditional_get
+from src.utils.service_capacity import (
+    ACTIVE_STATUSES, RECURRENCE_CHECK_DAYS, capacity_conflicts, expand_occurrences, format_occurrence, open_slots,
+    schedule_interval, schedules_in_window
+)
+from src.utils.recurrence import iter_starts, last_start, parse_rule
+from src.utils.datetimes import parse_datetime
+from src.utils.provider_metrics import NUMERIC_METRIC_TYPES, metric_series, parse_metric_value, record_samples
+from itertools import takewhile
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
+from datetime import datetime, timedelta
 import uuid
 
 service_provider_bp = Blueprint('service_provider', __name__)
 
-# Get all service providers or filter by status
+EDITABLE_FIELDS = ('name', 'tagline', 'description', 'icon', 'contact_phone', 'contact_email', 'operating_hours',
+                   'status', 'max_concurrent_jobs')
+DEFAULT_JOB_MINUTES = 60
+MAX_AVAILABILITY_DAYS = 31
+MAX_CALENDAR_DAYS = 366
+MAX_METRIC_SAMPLES = 1000
+
+# Get a page of service providers, optionally filtered by status
 @service_provider_bp.route('/service_providers', methods=['GET'])
+@conditional_get(ServiceProvider, ProviderService, ProviderMetric, ProviderActivity)
 def get_service_providers():
     status = request.args.get('status')
+    try:
+        limit, after = get_page_args(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    # view=summary skips services, metrics and activities altogether
+    summary = request.args.get('view') == 'summary'
+    query = ServiceProvider.query if summary else ServiceProvider.with_details()
     if status:
-        providers = ServiceProvider.query.filter_by(status=status).all()
+        query = query.filter_by(status=status)
+
+    providers, next_cursor = paginate(query, ServiceProvider, limit, after)
+    if summary:
+        data = [provider.to_summary_dict() for provider in providers]
     else:
-        providers = ServiceProvider.query.all()
-    return jsonify([provider.to_dict() for provider in providers]), 200
+        activities = ProviderActivity.latest_for([provider.id for provider in providers])
+        data = [provider.to_dict(activities.get(provider.id, [])) for provider in providers]
+    response = jsonify(data)
+    if next_cursor:
+        response.headers['X-Next-Cursor'] = next_cursor
+    return response, 200
 
 # Get a single service provider by ID
 @service_provider_bp.route('/service_providers/<int:id>', methods=['GET'])
 def get_service_provider(id):
-    provider = ServiceProvider.query.get_or_404(id)
-    return jsonify(provider.to_dict()), 200
+    provider = ServiceProvider.with_details().filter_by(id=id).first_or_404()
+    return jsonify(provider.to_dict()), 200, {'ETag': etag(provider.version)}
 
 # Create a new service provider
 @service_provider_bp.route('/service_providers', methods=['POST'])
@@ -40,34 +80,48 @@ def create_service_provider():
         contact_phone=data.get('contact_phone'),
         contact_email=data.get('contact_email'),
         operating_hours=data.get('operating_hours'),
-        status=data.get('status', 'active')
+        status=data.get('status', 'active'),
+        max_concurrent_jobs=data.get('max_concurrent_jobs', 1)
     )
     db.session.add(provider)
+    db.session.flush()
+    log_activity('provider_created', 'service_provider', provider.id, f'Service provider added: {provider.name}',
+                 provider_id=provider.id)
     db.session.commit()
-    return jsonify(provider.to_dict()), 201
+    return jsonify(provider.to_dict()), 201, {'ETag': etag(provider.version)}
 
-# Update a service provider
+# Update a service provider if it is still at the version named by If-Match
 @service_provider_bp.route('/service_providers/<int:id>', methods=['PUT'])
 def update_service_provider(id):
-    provider = ServiceProvider.query.get_or_404(id)
-    data = request.get_json()
-    
-    provider.name = data.get('name', provider.name)
-    provider.tagline = data.get('tagline', provider.tagline)
-    provider.description = data.get('description', provider.description)
-    provider.icon = data.get('icon', provider.icon)
-    provider.contact_phone = data.get('contact_phone', provider.contact_phone)
-    provider.contact_email = data.get('contact_email', provider.contact_email)
-    provider.operating_hours = data.get('operating_hours', provider.operating_hours)
-    provider.status = data.get('status', provider.status)
-    
+    try:
+        version = if_match_version(request.headers)
+    except LookupError as e:
+        return jsonify({'error': str(e)}), 428
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    data = request.get_json() or {}
+    values = {field: data[field] for field in EDITABLE_FIELDS if field in data}
+    provider, current_version = conditional_update(ServiceProvider, id, version, values)
+    if provider is None:
+        if current_version is None:
+            abort(404)
+        return jsonify({
+            'error': 'Service provider was changed by another request',
+            'current_version': current_version
+        }), 412, {'ETag': etag(current_version)}
+
+    log_activity('provider_updated', 'service_provider', provider.id, f'Service provider updated: {provider.name}',
+                 provider_id=provider.id)
     db.session.commit()
-    return jsonify(provider.to_dict()), 200
+    return jsonify(provider.to_dict()), 200, {'ETag': etag(provider.version)}
 
 # Delete a service provider
 @service_provider_bp.route('/service_providers/<int:id>', methods=['DELETE'])
 def delete_service_provider(id):
     provider = ServiceProvider.query.get_or_404(id)
+    log_activity('provider_deleted', 'service_provider', provider.id, f'Service provider removed: {provider.name}',
+                 provider_id=provider.id)
     db.session.delete(provider)
     db.session.commit()
     return jsonify({'message': 'Service provider deleted'}), 200
@@ -103,14 +157,74 @@ def create_provider_metric(provider_id):
     metric = ProviderMetric(
         provider_id=provider_id,
         metric_name=data['metric_name'],
-        metric_value=data['metric_value'],
+        metric_value=str(data['metric_value']),
         metric_type=data.get('metric_type', 'text'),
         display_order=data.get('display_order', 0)
     )
     db.session.add(metric)
+    db.session.flush()
+    # Numeric metrics start their time series with the initial value
+    if metric.metric_type in NUMERIC_METRIC_TYPES:
+        try:
+            value = parse_metric_value(data['metric_value'])
+        except ValueError:
+            value = None
+        if value is not None:
+            record_samples(metric, [(datetime.utcnow(), value)])
+    db.session.commit()
+    return jsonify(metric.to_dict()), 201
+
+# Record one or more readings of a numeric provider metric
+@service_provider_bp.route('/service_providers/<int:provider_id>/metrics/<int:metric_id>/samples', methods=['POST'])
+def create_metric_samples(provider_id, metric_id):
+    metric = ProviderMetric.query.filter_by(id=metric_id, provider_id=provider_id).first_or_404()
+    data = request.get_json()
+    if not data:
+        return jsonify({'error': 'value or samples is required'}), 400
+
+    items = data['samples'] if 'samples' in data else [data]
+    if not isinstance(items, list) or not items:
+        return jsonify({'error': 'samples must be a non-empty list'}), 400
+    if len(items) > MAX_METRIC_SAMPLES:
+        return jsonify({'error': f'At most {MAX_METRIC_SAMPLES} samples are allowed per request'}), 400
+    now = datetime.utcnow()
+    try:
+        samples = [
+            (parse_datetime(item['recorded_at']) if item.get('recorded_at') else now,
+             parse_metric_value(item['value']))
+            for item in items
+        ]
+        record_samples(metric, samples)
+    except KeyError:
+        db.session.rollback()
+        return jsonify({'error': 'Every sample needs a value'}), 400
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 400
+    except IntegrityError:
+        db.session.rollback()
+        return jsonify({'error': 'A sample is already recorded at one of these times'}), 409
     db.session.commit()
     return jsonify(metric.to_dict()), 201
 
+# Get a metric's history, read from the coarsest rollup that fits the range
+@service_provider_bp.route('/service_providers/<int:provider_id>/metrics/<int:metric_id>/series', methods=['GET'])
+def get_metric_series(provider_id, metric_id):
+    metric = ProviderMetric.query.filter_by(id=metric_id, provider_id=provider_id).first_or_404()
+    try:
+        end = parse_datetime(request.args['end']) if request.args.get('end') else datetime.utcnow()
+        start = parse_datetime(request.args['start']) if request.args.get('start') else end - timedelta(days=30)
+        if start >= end:
+            raise ValueError('start must be before end')
+        resolution, points = metric_series(metric, start, end, request.args.get('resolution', 'auto'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({
+        'metric': metric.to_dict(),
+        'resolution': resolution,
+        'points': points
+    }), 200
+
 # Create a provider activity
 @service_provider_bp.route('/service_providers/<int:provider_id>/activities', methods=['POST'])
 def create_provider_activity(provider_id):
@@ -127,10 +241,21 @@ def create_provider_activity(provider_id):
         activity_date=data.get('activity_date', datetime.utcnow())
     )
     db.session.add(activity)
+    log_activity(activity.activity_type, 'service_provider', provider_id, activity.description, provider_id=provider_id)
     db.session.commit()
     return jsonify(activity.to_dict()), 201
 
-# Create a service schedule
+def _lock_provider(provider_id):
+    """Touch the provider row so concurrent bookings queue up behind this transaction
+    instead of racing its capacity check"""
+    db.session.execute(
+        update(ServiceProvider)
+        .where(ServiceProvider.id == provider_id)
+        .values(updated_at=ServiceProvider.updated_at, version=ServiceProvider.version),
+        execution_options={'synchronize_session': False}
+    )
+
+# Create a service schedule, optionally recurring
 @service_provider_bp.route('/service_providers/<int:provider_id>/schedules', methods=['POST'])
 def create_service_schedule(provider_id):
     provider = ServiceProvider.query.get_or_404(provider_id)
@@ -143,15 +268,151 @@ def create_service_schedule(provider_id):
     if service.provider_id != provider_id:
         return jsonify({'error': 'Service does not belong to this provider'}), 400
     
+    try:
+        scheduled_date = parse_datetime(data['scheduled_date'])
+        scheduled_time = datetime.strptime(data['scheduled_time'], '%H:%M:%S').time()
+        duration_minutes = int(data.get('duration_minutes', DEFAULT_JOB_MINUTES))
+        rule = parse_rule(data['recurrence']) if data.get('recurrence') else None
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if duration_minutes < 1:
+        return jsonify({'error': 'duration_minutes must be at least 1'}), 400
+    starts_at, ends_at = schedule_interval(scheduled_date, scheduled_time, duration_minutes)
+    duration = ends_at - starts_at
+    status = data.get('status', 'scheduled')
+
+    intervals = [(starts_at, ends_at)]
+    if rule:
+        # A series keeps the end of its last occurrence so window reads can skip it once it is over
+        last = last_start(rule, starts_at)
+        if rule['until'] and last is None:
+            return jsonify({'error': 'recurrence UNTIL is before the first occurrence'}), 400
+        ends_at = last + duration if last else None
+        horizon = starts_at + timedelta(days=RECURRENCE_CHECK_DAYS)
+        intervals = [(start, start + duration)
+                     for start in takewhile(lambda start: start < horizon, iter_starts(rule, starts_at))]
+
+    if status in ACTIVE_STATUSES:
+        _lock_provider(provider_id)
+        error, conflicts = capacity_conflicts(provider, intervals)
+        if error:
+            db.session.rollback()
+            return jsonify({
+                'error': error,
+                'conflicts': [format_occurrence(occurrence) for occurrence in conflicts]
+            }), 409
+
     schedule = ServiceSchedule(
         provider_id=provider_id,
         service_id=data['service_id'],
-        scheduled_date=datetime.fromisoformat(data['scheduled_date']),
-        scheduled_time=datetime.strptime(data['scheduled_time'], '%H:%M:%S').time(),
+        scheduled_date=scheduled_date,
+        scheduled_time=scheduled_time,
+        duration_minutes=duration_minutes,
+        starts_at=starts_at,
+        ends_at=ends_at,
+        recurrence=data.get('recurrence'),
         special_requirements=data.get('special_requirements'),
-        status=data.get('status', 'scheduled'),
+        status=status,
         requested_by=data.get('requested_by')
     )
     db.session.add(schedule)
+    log_activity('service_scheduled', 'service_provider', provider_id,
+                 f'{service.name} scheduled with {provider.name} for {schedule.scheduled_date.date().isoformat()}',
+                 user_id=schedule.requested_by, provider_id=provider_id)
+    db.session.commit()
+    return jsonify(schedule.to_dict()), 201
+
+# Get a provider's open slots over a date range
+@service_provider_bp.route('/service_providers/<int:provider_id>/availability', methods=['GET'])
+def get_provider_availability(provider_id):
+    provider = ServiceProvider.query.get_or_404(provider_id)
+    try:
+        start = parse_datetime(request.args['start']) if request.args.get('start') else datetime.utcnow()
+        end = parse_datetime(request.args['end']) if request.args.get('end') else start + timedelta(days=1)
+        duration_minutes = int(request.args.get('duration', DEFAULT_JOB_MINUTES))
+        step_minutes = int(request.args.get('step', duration_minutes))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if start >= end:
+        return jsonify({'error': 'start must be before end'}), 400
+    if end - start > timedelta(days=MAX_AVAILABILITY_DAYS):
+        return jsonify({'error': f'Availability can span at most {MAX_AVAILABILITY_DAYS} days'}), 400
+    if duration_minutes < 1 or step_minutes < 1:
+        return jsonify({'error': 'duration and step must be at least 1 minute'}), 400
+
+    slots = open_slots(provider, start, end, duration_minutes, step_minutes)
+    return jsonify({
+        'provider_id': provider_id,
+        'max_concurrent_jobs': provider.max_concurrent_jobs,
+        'operating_hours': provider.operating_hours,
+        'duration_minutes': duration_minutes,
+        'slots': [
+            {'starts_at': starts_at.isoformat(), 'ends_at': ends_at.isoformat(), 'remaining': remaining}
+            for starts_at, ends_at, remaining in slots
+        ]
+    }), 200
+
+# Get a provider's schedule occurrences over a date range, recurring series expanded
+@service_provider_bp.route('/service_providers/<int:provider_id>/calendar', methods=['GET'])
+def get_provider_calendar(provider_id):
+    ServiceProvider.query.get_or_404(provider_id)
+    try:
+        start = parse_datetime(request.args['start'])
+        end = parse_datetime(request.args['end'])
+    except KeyError:
+        return jsonify({'error': 'start and end are required'}), 400
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if start >= end:
+        return jsonify({'error': 'start must be before end'}), 400
+    if end - start > timedelta(days=MAX_CALENDAR_DAYS):
+        return jsonify({'error': f'Calendar can span at most {MAX_CALENDAR_DAYS} days'}), 400
+
+    occurrences = expand_occurrences(schedules_in_window(provider_id, start, end), start, end)
+    if request.args.get('include_cancelled') not in ('1', 'true'):
+        occurrences = [occurrence for occurrence in occurrences if occurrence['status'] != 'cancelled']
+    return jsonify([format_occurrence(occurrence) for occurrence in occurrences]), 200
+
+# Cancel, complete, move or annotate one occurrence of a recurring schedule
+@service_provider_bp.route('/service_providers/<int:provider_id>/schedules/<int:schedule_id>/occurrences', methods=['PUT'])
+def update_schedule_occurrence(provider_id, schedule_id):
+    provider = ServiceProvider.query.get_or_404(provider_id)
+    schedule = ServiceSchedule.query.filter_by(id=schedule_id, provider_id=provider_id).first_or_404()
+    data = request.get_json()
+    if not schedule.recurrence:
+        return jsonify({'error': 'Schedule is not recurring'}), 400
+    if not data or not data.get('occurrence_start'):
+        return jsonify({'error': 'occurrence_start is required'}), 400
+
+    try:
+        occurrence_start = parse_datetime(data['occurrence_start'])
+        starts_at = parse_datetime(data['starts_at']) if data.get('starts_at') else None
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    # The occurrence must be one the rule actually generates
+    if next(iter_starts(parse_rule(schedule.recurrence), schedule.starts_at, after=occurrence_start), None) != occurrence_start:
+        return jsonify({'error': 'No occurrence of this schedule starts at that time'}), 404
+
+    exception = ScheduleException.query.filter_by(schedule_id=schedule_id, occurrence_start=occurrence_start).first()
+    if exception is None:
+        exception = ScheduleException(schedule_id=schedule_id, occurrence_start=occurrence_start)
+        db.session.add(exception)
+    exception.status = data.get('status', exception.status)
+    exception.notes = data.get('notes', exception.notes)
+    if starts_at:
+        exception.starts_at = starts_at
+        exception.ends_at = starts_at + timedelta(minutes=schedule.duration_minutes)
+
+    if starts_at and (exception.status or schedule.status) in ACTIVE_STATUSES:
+        _lock_provider(provider_id)
+        error, conflicts = capacity_conflicts(provider, [(exception.starts_at, exception.ends_at)],
+                                              ignore=(schedule_id, occurrence_start))
+        if error:
+            db.session.rollback()
+            return jsonify({
+                'error': error,
+                'conflicts': [format_occurrence(occurrence) for occurrence in conflicts]
+            }), 409
+
     db.session.commit()
-    return jsonify(schedule.to_dict()), 201
\ No newline at end of file
+    return jsonify(exception.to_dict()), 200
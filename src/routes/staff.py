@@ -1,12 +1,17 @@
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, abort, jsonify, request
+from werkzeug.exceptions import HTTPException
 from src.models.staff import Staff, db
+from src.utils.pagination import get_page_args, paginate, page_meta
+from src.utils.concurrency import conditional_update, etag, if_match_version
 from datetime import datetime
 
 staff_bp = Blueprint('staff', __name__)
 
+EDITABLE_FIELDS = ('employee_id', 'name', 'department', 'position', 'email', 'phone', 'status')
+
 @staff_bp.route('/staff', methods=['GET'])
 def get_staff():
-    """Get all staff with optional filtering"""
+    """Get a page of staff with optional filtering"""
     department = request.args.get('department')
     status = request.args.get('status')
     
@@ -17,10 +22,21 @@ def get_staff():
     if status:
         query = query.filter(Staff.status == status)
     
-    staff_members = query.order_by(Staff.created_at.desc()).all()
+    try:
+        limit, after = get_page_args(request.args)
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'data': None,
+            'message': 'Invalid pagination parameters',
+            'errors': [str(e)]
+        }), 400
+
+    staff_members, next_cursor = paginate(query, Staff, limit, after)
     return jsonify({
         'success': True,
         'data': [staff.to_dict() for staff in staff_members],
+        'pagination': page_meta(limit, next_cursor),
         'message': f'Retrieved {len(staff_members)} staff members'
     })
 
@@ -47,7 +63,7 @@ def create_staff():
             'success': True,
             'data': staff.to_dict(),
             'message': 'Staff member created successfully'
-        }), 201
+        }), 201, {'ETag': etag(staff.version)}
         
     except Exception as e:
         return jsonify({
@@ -65,33 +81,56 @@ def get_staff_member(staff_id):
         'success': True,
         'data': staff.to_dict(),
         'message': 'Staff member retrieved successfully'
-    })
+    }), 200, {'ETag': etag(staff.version)}
 
 @staff_bp.route('/staff/<int:staff_id>', methods=['PUT'])
 def update_staff(staff_id):
-    """Update a staff member"""
+    """Update a staff member if they are still at the version named by If-Match"""
+    try:
+        version = if_match_version(request.headers)
+    except LookupError as e:
+        return jsonify({
+            'success': False,
+            'data': None,
+            'message': 'Failed to update staff member',
+            'errors': [str(e)]
+        }), 428
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'data': None,
+            'message': 'Failed to update staff member',
+            'errors': [str(e)]
+        }), 400
+
     try:
-        staff = Staff.query.get_or_404(staff_id)
         data = request.json
-        
-        staff.employee_id = data.get('employee_id', staff.employee_id)
-        staff.name = data.get('name', staff.name)
-        staff.department = data.get('department', staff.department)
-        staff.position = data.get('position', staff.position)
-        staff.email = data.get('email', staff.email)
-        staff.phone = data.get('phone', staff.phone)
-        staff.status = data.get('status', staff.status)
-        staff.updated_at = datetime.utcnow()
-        
+        values = {field: data[field] for field in EDITABLE_FIELDS if field in data}
+        values['updated_at'] = datetime.utcnow()
+
+        staff, current_version = conditional_update(Staff, staff_id, version, values)
+        if staff is None:
+            if current_version is None:
+                abort(404)
+            return jsonify({
+                'success': False,
+                'data': {'current_version': current_version},
+                'message': 'Staff member was changed by another request',
+                'errors': ['If-Match does not match the current version']
+            }), 412, {'ETag': etag(current_version)}
+
         db.session.commit()
         
         return jsonify({
             'success': True,
             'data': staff.to_dict(),
             'message': 'Staff member updated successfully'
-        })
+        }), 200, {'ETag': etag(staff.version)}
         
+    except HTTPException:
+        raise
     except Exception as e:
+        db.session.rollback()
         return jsonify({
             'success': False,
             'data': None,
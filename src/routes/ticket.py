@@ -1,17 +1,36 @@
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, abort, jsonify, request
+from werkzeug.exceptions import HTTPException
 from src.models.ticket import Ticket, db
+from sqlalchemy import bindparam, func, insert, update
+from src.utils.pagination import get_limit, get_page_args, paginate, page_meta
+from src.utils.search import search_ticket_ids
+from src.utils.counters import apply_deltas
+from src.utils.changes import record_changes
+from src.utils.events import broker
+from src.utils.export import EXPORT_FORMATS, export_response
+from src.utils.locations import resolve_location_ids, subtree_condition
+from src.utils.activity import log_activity, log_activities
+from src.utils.concurrency import conditional_update, etag, if_match_version
+from src.utils.conditional import conditional_get
+from src.utils.serializers import get_layout, ticket_serializer
+from src.models.user import User
 from datetime import datetime
 
 ticket_bp = Blueprint('ticket', __name__)
 
+MAX_BULK_OPERATIONS = 1000
+RESOLVED_STATUSES = ('resolved', 'closed')
+EDITABLE_FIELDS = ('title', 'description', 'priority', 'status', 'category', 'assigned_to', 'location')
+
 @ticket_bp.route('/tickets', methods=['GET'])
+@conditional_get(Ticket, User)
 def get_tickets():
-    """Get all tickets with optional filtering"""
+    """Get a page of tickets with optional filtering"""
     status = request.args.get('status')
     priority = request.args.get('priority')
     assigned_to = request.args.get('assigned_to')
     
-    query = Ticket.query
+    query = ticket_serializer.query()
     
     if status:
         query = query.filter(Ticket.status == status)
@@ -20,13 +39,99 @@ def get_tickets():
     if assigned_to:
         query = query.filter(Ticket.assigned_to == assigned_to)
     
-    tickets = query.order_by(Ticket.created_at.desc()).all()
+    try:
+        subtree = subtree_condition(Ticket, request.args)
+    except (LookupError, ValueError) as e:
+        return jsonify({
+            'success': False,
+            'data': None,
+            'message': 'Invalid location filter',
+            'errors': [str(e)]
+        }), 400
+    if subtree is not None:
+        query = query.filter(subtree)
+
+    try:
+        limit, after = get_page_args(request.args)
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'data': None,
+            'message': 'Invalid pagination parameters',
+            'errors': [str(e)]
+        }), 400
+
+    try:
+        layout = get_layout(request.args)
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'data': None,
+            'message': 'Invalid layout',
+            'errors': [str(e)]
+        }), 400
+
+    # Serialized from result rows; layout=columnar returns one array per field
+    rows, next_cursor = paginate(query, Ticket, limit, after)
+    return jsonify({
+        'success': True,
+        'data': ticket_serializer.serialize(rows, layout),
+        'pagination': page_meta(limit, next_cursor),
+        'message': f'Retrieved {len(rows)} tickets'
+    })
+
+@ticket_bp.route('/tickets/search', methods=['GET'])
+def search_tickets():
+    """Full-text search over ticket title, description, location and category"""
+    q = request.args.get('q', '').strip()
+    try:
+        limit = get_limit(request.args)
+        offset = int(request.args.get('after', 0))
+        if offset < 0:
+            raise ValueError('after must not be negative')
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'data': None,
+            'message': 'Invalid search parameters',
+            'errors': [str(e)]
+        }), 400
+
+    if not q:
+        return jsonify({
+            'success': False,
+            'data': None,
+            'message': 'Invalid search parameters',
+            'errors': ['q is required']
+        }), 400
+
+    ids = search_ticket_ids(db.session, q, limit, offset)
+    next_cursor = str(offset + limit) if len(ids) > limit else None
+    ids = ids[:limit]
+
+    # Hydrate the page in one query, then restore rank order
+    by_id = {ticket.id: ticket for ticket in Ticket.with_users().filter(Ticket.id.in_(ids)).all()} if ids else {}
+    tickets = [by_id[ticket_id] for ticket_id in ids if ticket_id in by_id]
     return jsonify({
         'success': True,
         'data': [ticket.to_dict() for ticket in tickets],
-        'message': f'Retrieved {len(tickets)} tickets'
+        'pagination': page_meta(limit, next_cursor),
+        'message': f'Found {len(tickets)} tickets'
     })
 
+@ticket_bp.route('/tickets/export', methods=['GET'])
+def export_tickets():
+    """Stream every ticket as CSV or NDJSON"""
+    fmt = request.args.get('format', 'csv')
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({
+            'success': False,
+            'data': None,
+            'message': 'Invalid export format',
+            'errors': [f"format must be one of {', '.join(EXPORT_FORMATS)}"]
+        }), 400
+    return export_response(Ticket, 'tickets', fmt, use_gzip=request.args.get('gzip') in ('1', 'true'))
+
 @ticket_bp.route('/tickets', methods=['POST'])
 def create_ticket():
     """Create a new ticket"""
@@ -45,13 +150,16 @@ def create_ticket():
         )
         
         db.session.add(ticket)
+        db.session.flush()
+        log_activity('ticket_created', 'ticket', ticket.id, f'New ticket created: {ticket.title}', user_id=ticket.created_by)
         db.session.commit()
+        broker.publish('ticket_created', ticket.to_dict())
         
         return jsonify({
             'success': True,
             'data': ticket.to_dict(),
             'message': 'Ticket created successfully'
-        }), 201
+        }), 201, {'ETag': etag(ticket.version)}
         
     except Exception as e:
         return jsonify({
@@ -69,37 +177,64 @@ def get_ticket(ticket_id):
         'success': True,
         'data': ticket.to_dict(),
         'message': 'Ticket retrieved successfully'
-    })
+    }), 200, {'ETag': etag(ticket.version)}
 
 @ticket_bp.route('/tickets/<int:ticket_id>', methods=['PUT'])
 def update_ticket(ticket_id):
-    """Update a ticket"""
+    """Update a ticket if it is still at the version named by If-Match"""
+    try:
+        version = if_match_version(request.headers)
+    except LookupError as e:
+        return jsonify({
+            'success': False,
+            'data': None,
+            'message': 'Failed to update ticket',
+            'errors': [str(e)]
+        }), 428
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'data': None,
+            'message': 'Failed to update ticket',
+            'errors': [str(e)]
+        }), 400
+
     try:
-        ticket = Ticket.query.get_or_404(ticket_id)
         data = request.json
-        
-        ticket.title = data.get('title', ticket.title)
-        ticket.description = data.get('description', ticket.description)
-        ticket.priority = data.get('priority', ticket.priority)
-        ticket.status = data.get('status', ticket.status)
-        ticket.category = data.get('category', ticket.category)
-        ticket.assigned_to = data.get('assigned_to', ticket.assigned_to)
-        ticket.location = data.get('location', ticket.location)
-        ticket.updated_at = datetime.utcnow()
-        
+        now = datetime.utcnow()
+        values = {field: data[field] for field in EDITABLE_FIELDS if field in data}
+        values['updated_at'] = now
         # Set resolved_at if status is resolved or closed
-        if data.get('status') in ['resolved', 'closed'] and not ticket.resolved_at:
-            ticket.resolved_at = datetime.utcnow()
-        
+        if data.get('status') in RESOLVED_STATUSES:
+            values['resolved_at'] = func.coalesce(Ticket.resolved_at, now)
+        # conditional_update moves the location subtree counts along with the row
+        if 'location' in values:
+            values['location_id'] = resolve_location_ids(db.session, [values['location']]).get(values['location'])
+
+        ticket, current_version = conditional_update(Ticket, ticket_id, version, values)
+        if ticket is None:
+            if current_version is None:
+                abort(404)
+            return jsonify({
+                'success': False,
+                'data': {'current_version': current_version},
+                'message': 'Ticket was changed by another request',
+                'errors': ['If-Match does not match the current version']
+            }), 412, {'ETag': etag(current_version)}
+
+        log_activity('ticket_updated', 'ticket', ticket.id, f'Ticket updated: {ticket.title}', user_id=data.get('updated_by'))
         db.session.commit()
         
         return jsonify({
             'success': True,
             'data': ticket.to_dict(),
             'message': 'Ticket updated successfully'
-        })
+        }), 200, {'ETag': etag(ticket.version)}
         
+    except HTTPException:
+        raise
     except Exception as e:
+        db.session.rollback()
         return jsonify({
             'success': False,
             'data': None,
@@ -112,6 +247,7 @@ def delete_ticket(ticket_id):
     """Delete a ticket"""
     try:
         ticket = Ticket.query.get_or_404(ticket_id)
+        log_activity('ticket_deleted', 'ticket', ticket.id, f'Ticket deleted: {ticket.title}')
         db.session.delete(ticket)
         db.session.commit()
         
@@ -140,6 +276,7 @@ def assign_ticket(ticket_id):
         ticket.status = 'in_progress'
         ticket.updated_at = datetime.utcnow()
         
+        log_activity('ticket_assigned', 'ticket', ticket.id, f'Ticket assigned: {ticket.title}', user_id=ticket.assigned_to)
         db.session.commit()
         
         return jsonify({
@@ -171,7 +308,11 @@ def update_ticket_status(ticket_id):
         if data['status'] in ['resolved', 'closed'] and old_status not in ['resolved', 'closed']:
             ticket.resolved_at = datetime.utcnow()
         
+        log_activity('ticket_status_changed', 'ticket', ticket.id,
+                     f'Ticket status changed from {old_status} to {ticket.status}: {ticket.title}',
+                     user_id=data.get('updated_by'))
         db.session.commit()
+        broker.publish('ticket_status_changed', dict(ticket.to_dict(), previous_status=old_status))
         
         return jsonify({
             'success': True,
@@ -187,3 +328,222 @@ def update_ticket_status(ticket_id):
             'errors': [str(e)]
         }), 400
 
+
+def _expected_version(item):
+    """The version a bulk item was read at, or None for '*' (write whatever is current)"""
+    version = item.get('version')
+    if version is None:
+        raise ValueError("version is required; send the version from your last read, or '*'")
+    if version == '*':
+        return None
+    if isinstance(version, bool) or not isinstance(version, (int, str)):
+        raise ValueError('version must be an integer')
+    return int(version)
+
+def _version_conflict(index, op, ticket_id, current_version):
+    return {'index': index, 'op': op, 'id': ticket_id, 'success': False, 'status': 412,
+            'current_version': current_version, 'errors': ['version does not match the current version']}
+
+def _item_data(item):
+    """The data object of a bulk item, raising ValueError when it is not an object"""
+    data = item.get('data')
+    if data is None:
+        return {}
+    if not isinstance(data, dict):
+        raise ValueError('data must be an object')
+    return data
+
+def _item_id(item):
+    """The ticket id of a bulk item, raising ValueError when it is not an integer"""
+    ticket_id = item.get('id')
+    if isinstance(ticket_id, bool) or not isinstance(ticket_id, int):
+        raise ValueError('id must be an integer')
+    return ticket_id
+
+def _apply_ticket_operation(op, item, row, now):
+    """Apply one bulk operation to a snapshot row, mirroring the single-row routes"""
+    if op == 'update':
+        data = _item_data(item)
+        for field in EDITABLE_FIELDS:
+            if field in data:
+                row[field] = data[field]
+        if data.get('status') in RESOLVED_STATUSES and not row['resolved_at']:
+            row['resolved_at'] = now
+    elif op == 'assign':
+        if 'assigned_to' not in item:
+            raise ValueError('assigned_to is required')
+        row['assigned_to'] = item['assigned_to']
+        row['status'] = 'in_progress'
+    elif op == 'status':
+        if not item.get('status'):
+            raise ValueError('status is required')
+        old_status = row['status']
+        row['status'] = item['status']
+        if item['status'] in RESOLVED_STATUSES and old_status not in RESOLVED_STATUSES:
+            row['resolved_at'] = now
+    row['updated_at'] = now
+
+@ticket_bp.route('/tickets/bulk', methods=['POST'])
+def bulk_tickets():
+    """Apply a batch of create, update, assign and status operations in one transaction"""
+    operations = (request.json or {}).get('operations')
+    if not isinstance(operations, list) or not operations:
+        return jsonify({
+            'success': False,
+            'data': None,
+            'message': 'Failed to apply bulk operations',
+            'errors': ['operations must be a non-empty list']
+        }), 400
+    if len(operations) > MAX_BULK_OPERATIONS:
+        return jsonify({
+            'success': False,
+            'data': None,
+            'message': 'Failed to apply bulk operations',
+            'errors': [f'At most {MAX_BULK_OPERATIONS} operations are allowed per request']
+        }), 400
+
+    try:
+        now = datetime.utcnow()
+        results = [None] * len(operations)
+
+        # Snapshot every referenced ticket with one IN query
+        ids = set()
+        for item in operations:
+            if isinstance(item, dict) and item.get('op') != 'create':
+                try:
+                    ids.add(_item_id(item))
+                except ValueError:
+                    pass  # reported against the item below
+        columns = [Ticket.id, Ticket.version, Ticket.resolved_at, Ticket.location_id] + [getattr(Ticket, field) for field in EDITABLE_FIELDS]
+        originals = {
+            row.id: row._asdict()
+            for row in db.session.query(*columns).filter(Ticket.id.in_(ids)).all()
+        } if ids else {}
+        rows = {ticket_id: dict(row) for ticket_id, row in originals.items()}
+
+        creates, create_indexes = [], []
+        indexes_by_id = {}
+        for index, item in enumerate(operations):
+            op = item.get('op') if isinstance(item, dict) else None
+            try:
+                if op == 'create':
+                    data = _item_data(item)
+                    if not data.get('title') or not data.get('created_by'):
+                        raise ValueError('title and created_by are required')
+                    creates.append({
+                        'title': data['title'],
+                        'description': data.get('description'),
+                        'priority': data.get('priority', 'medium'),
+                        'status': data.get('status', 'open'),
+                        'category': data.get('category'),
+                        'assigned_to': data.get('assigned_to'),
+                        'created_by': data['created_by'],
+                        'location': data.get('location')
+                    })
+                    create_indexes.append(index)
+                    continue
+                if op not in ('update', 'assign', 'status'):
+                    raise ValueError('op must be one of create, update, assign, status')
+                ticket_id = _item_id(item)
+                if ticket_id not in rows:
+                    raise ValueError(f"Ticket {ticket_id} not found")
+                # Same lost-update protection as If-Match on PUT /tickets/<id>
+                version = _expected_version(item)
+                current_version = originals[ticket_id]['version']
+                if version is not None and version != current_version:
+                    results[index] = _version_conflict(index, op, ticket_id, current_version)
+                    continue
+                _apply_ticket_operation(op, item, rows[ticket_id], now)
+                results[index] = {'index': index, 'op': op, 'id': ticket_id, 'success': True}
+                indexes_by_id.setdefault(ticket_id, []).append(index)
+            except ValueError as e:
+                results[index] = {'index': index, 'op': op, 'success': False, 'errors': [str(e)]}
+
+        # Link locations into the tree; subtree counts for bulk writes are
+        # left to the periodic reconciliation
+        changed = [row for ticket_id, row in rows.items() if row != originals[ticket_id]]
+        moved = [row for row in changed if row['location'] != originals[row['id']]['location']]
+        location_ids = resolve_location_ids(db.session, [row['location'] for row in creates + moved])
+        for row in creates + moved:
+            row['location_id'] = location_ids.get(row['location'])
+
+        new_ids = []
+        if creates:
+            new_ids = db.session.scalars(
+                insert(Ticket).returning(Ticket.id, sort_by_parameter_order=True), creates
+            ).all()
+            for index, ticket_id in zip(create_indexes, new_ids):
+                results[index] = {'index': index, 'op': 'create', 'id': ticket_id, 'success': True}
+
+        if changed:
+            # Each row is written only if it is still at the version snapshotted above
+            table = Ticket.__table__
+            fields = [field for field in changed[0] if field not in ('id', 'version')]
+            result = db.session.execute(
+                update(table)
+                .where(table.c.id == bindparam('b_id'), table.c.version == bindparam('b_version'))
+                .values({field: bindparam(field) for field in fields}),
+                # Only the SET fields and the b_ keys: a stray 'version' key would be written too
+                [dict({field: row[field] for field in fields}, b_id=row['id'], b_version=row['version'])
+                 for row in changed]
+            )
+            if result.rowcount != len(changed):
+                # Some rows moved on between the snapshot and the UPDATE (or the
+                # driver cannot count executemany rows): keep the ones we wrote
+                current = dict(db.session.query(Ticket.id, Ticket.version)
+                               .filter(Ticket.id.in_([row['id'] for row in changed]), Ticket.updated_at == now)
+                               .all())
+                lost = [row for row in changed if current.get(row['id']) != row['version'] + 1]
+                if lost:
+                    versions = dict(db.session.query(Ticket.id, Ticket.version)
+                                    .filter(Ticket.id.in_([row['id'] for row in lost])).all())
+                    for row in lost:
+                        for index in indexes_by_id[row['id']]:
+                            results[index] = _version_conflict(index, results[index]['op'], row['id'],
+                                                               versions.get(row['id']))
+                    lost_ids = {row['id'] for row in lost}
+                    changed = [row for row in changed if row['id'] not in lost_ids]
+            for row in changed:
+                for index in indexes_by_id[row['id']]:
+                    results[index]['version'] = row['version'] + 1
+
+        # Bulk statements skip the ORM flush, so feed the dashboard counters directly
+        deltas = {}
+        for row in creates:
+            for metric, field in (('ticket_by_status', 'status'), ('ticket_by_priority', 'priority')):
+                deltas[(metric, row[field])] = deltas.get((metric, row[field]), 0) + 1
+        for row in changed:
+            original = originals[row['id']]
+            for metric, field in (('ticket_by_status', 'status'), ('ticket_by_priority', 'priority')):
+                if row[field] != original[field]:
+                    deltas[(metric, original[field])] = deltas.get((metric, original[field]), 0) - 1
+                    deltas[(metric, row[field])] = deltas.get((metric, row[field]), 0) + 1
+        apply_deltas(db.session.connection(), {key: delta for key, delta in deltas.items() if delta})
+        record_changes(db.session.connection(), 'ticket', new_ids, 'create')
+        record_changes(db.session.connection(), 'ticket', [row['id'] for row in changed], 'update')
+        log_activities(
+            [{'activity_type': 'ticket_created', 'entity': 'ticket', 'entity_id': ticket_id,
+              'description': f"New ticket created: {row['title']}", 'user_id': row['created_by'], 'created_at': now}
+             for ticket_id, row in zip(new_ids, creates)]
+            + [{'activity_type': 'ticket_updated', 'entity': 'ticket', 'entity_id': row['id'],
+                'description': f"Ticket updated: {row['title']}", 'created_at': now}
+               for row in changed]
+        )
+
+        db.session.commit()
+
+        applied = sum(1 for result in results if result['success'])
+        return jsonify({
+            'success': True,
+            'data': results,
+            'message': f'Applied {applied} of {len(operations)} operations'
+        })
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({
+            'success': False,
+            'data': None,
+            'message': 'Failed to apply bulk operations',
+            'errors': [str(e)]
+        }), 400
@@ -1,17 +1,36 @@
-from flask import Blueprint, jsonify, request
-from src.models.tool import Tool, db
-from datetime import datetime
+from flask import Blueprint, abort, current_app, jsonify, request
+from werkzeug.exceptions import HTTPException
+from src.models.tool import Tool, ToolReservation, db
+from sqlalchemy import update
+from src.utils.events import broker
+from src.utils.counters import apply_deltas
+from src.utils.changes import record_changes
+from src.utils.pagination import get_page_args, paginate, page_meta
+from src.utils.export import EXPORT_FORMATS, export_response
+from src.utils.locations import resolve_location_ids, subtree_condition
+from src.utils.reservations import calendar
+from src.utils.overdue import sweeper
+from src.utils.activity import log_activity, log_activities
+from src.utils.concurrency import conditional_update, etag, if_match_version
+from src.utils.conditional import conditional_get
+from src.utils.serializers import get_layout, tool_serializer
+from src.models.user import User
+from src.utils.datetimes import parse_datetime
+from datetime import datetime, timedelta
 
 tool_bp = Blueprint('tool', __name__)
 
+EDITABLE_FIELDS = ('tool_name', 'tool_category', 'serial_number', 'condition', 'status', 'location')
+
 @tool_bp.route('/tools', methods=['GET'])
+@conditional_get(Tool, User)
 def get_tools():
-    """Get all tools with optional filtering"""
+    """Get a page of tools with optional filtering"""
     category = request.args.get('category')
     condition = request.args.get('condition')
     status = request.args.get('status')
     
-    query = Tool.query
+    query = tool_serializer.query()
     
     if category:
         query = query.filter(Tool.tool_category == category)
@@ -20,11 +39,71 @@ def get_tools():
     if status:
         query = query.filter(Tool.status == status)
     
-    tools = query.order_by(Tool.created_at.desc()).all()
+    try:
+        subtree = subtree_condition(Tool, request.args)
+    except (LookupError, ValueError) as e:
+        return jsonify({
+            'success': False,
+            'data': None,
+            'message': 'Invalid location filter',
+            'errors': [str(e)]
+        }), 400
+    if subtree is not None:
+        query = query.filter(subtree)
+
+    try:
+        limit, after = get_page_args(request.args)
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'data': None,
+            'message': 'Invalid pagination parameters',
+            'errors': [str(e)]
+        }), 400
+
+    try:
+        layout = get_layout(request.args)
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'data': None,
+            'message': 'Invalid layout',
+            'errors': [str(e)]
+        }), 400
+
+    # Serialized from result rows; layout=columnar returns one array per field
+    rows, next_cursor = paginate(query, Tool, limit, after)
+    return jsonify({
+        'success': True,
+        'data': tool_serializer.serialize(rows, layout),
+        'pagination': page_meta(limit, next_cursor),
+        'message': f'Retrieved {len(rows)} tools'
+    })
+
+@tool_bp.route('/tools/export', methods=['GET'])
+def export_tools():
+    """Stream every tool as CSV or NDJSON"""
+    fmt = request.args.get('format', 'csv')
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({
+            'success': False,
+            'data': None,
+            'message': 'Invalid export format',
+            'errors': [f"format must be one of {', '.join(EXPORT_FORMATS)}"]
+        }), 400
+    return export_response(Tool, 'tools', fmt, use_gzip=request.args.get('gzip') in ('1', 'true'))
+
+@tool_bp.route('/tools/overdue', methods=['GET'])
+def get_overdue_tools():
+    """Get checked-out tools past their expected return time, most overdue first"""
+    tools = (Tool.with_users()
+             .filter(Tool.status == 'in_use', Tool.expected_return_at < datetime.utcnow())
+             .order_by(Tool.expected_return_at)
+             .all())
     return jsonify({
         'success': True,
         'data': [tool.to_dict() for tool in tools],
-        'message': f'Retrieved {len(tools)} tools'
+        'message': f'Retrieved {len(tools)} overdue tools'
     })
 
 @tool_bp.route('/tools', methods=['POST'])
@@ -43,13 +122,15 @@ def create_tool():
         )
         
         db.session.add(tool)
+        db.session.flush()
+        log_activity('tool_created', 'tool', tool.id, f'Tool added: {tool.tool_name}')
         db.session.commit()
         
         return jsonify({
             'success': True,
             'data': tool.to_dict(),
             'message': 'Tool created successfully'
-        }), 201
+        }), 201, {'ETag': etag(tool.version)}
         
     except Exception as e:
         return jsonify({
@@ -67,32 +148,60 @@ def get_tool(tool_id):
         'success': True,
         'data': tool.to_dict(),
         'message': 'Tool retrieved successfully'
-    })
+    }), 200, {'ETag': etag(tool.version)}
 
 @tool_bp.route('/tools/<int:tool_id>', methods=['PUT'])
 def update_tool(tool_id):
-    """Update a tool"""
+    """Update a tool if it is still at the version named by If-Match"""
+    try:
+        version = if_match_version(request.headers)
+    except LookupError as e:
+        return jsonify({
+            'success': False,
+            'data': None,
+            'message': 'Failed to update tool',
+            'errors': [str(e)]
+        }), 428
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'data': None,
+            'message': 'Failed to update tool',
+            'errors': [str(e)]
+        }), 400
+
     try:
-        tool = Tool.query.get_or_404(tool_id)
         data = request.json
-        
-        tool.tool_name = data.get('tool_name', tool.tool_name)
-        tool.tool_category = data.get('tool_category', tool.tool_category)
-        tool.serial_number = data.get('serial_number', tool.serial_number)
-        tool.condition = data.get('condition', tool.condition)
-        tool.status = data.get('status', tool.status)
-        tool.location = data.get('location', tool.location)
-        tool.updated_at = datetime.utcnow()
-        
+        values = {field: data[field] for field in EDITABLE_FIELDS if field in data}
+        values['updated_at'] = datetime.utcnow()
+        # conditional_update moves the location subtree counts along with the row
+        if 'location' in values:
+            values['location_id'] = resolve_location_ids(db.session, [values['location']]).get(values['location'])
+
+        tool, current_version = conditional_update(Tool, tool_id, version, values)
+        if tool is None:
+            if current_version is None:
+                abort(404)
+            return jsonify({
+                'success': False,
+                'data': {'current_version': current_version},
+                'message': 'Tool was changed by another request',
+                'errors': ['If-Match does not match the current version']
+            }), 412, {'ETag': etag(current_version)}
+
+        log_activity('tool_updated', 'tool', tool.id, f'Tool updated: {tool.tool_name}')
         db.session.commit()
         
         return jsonify({
             'success': True,
             'data': tool.to_dict(),
             'message': 'Tool updated successfully'
-        })
+        }), 200, {'ETag': etag(tool.version)}
         
+    except HTTPException:
+        raise
     except Exception as e:
+        db.session.rollback()
         return jsonify({
             'success': False,
             'data': None,
@@ -105,6 +214,7 @@ def delete_tool(tool_id):
     """Delete a tool"""
     try:
         tool = Tool.query.get_or_404(tool_id)
+        log_activity('tool_deleted', 'tool', tool.id, f'Tool removed: {tool.tool_name}')
         db.session.delete(tool)
         db.session.commit()
         
@@ -122,27 +232,79 @@ def delete_tool(tool_id):
             'errors': [str(e)]
         }), 400
 
+def _transition_tools(tool_ids, from_status, values):
+    """Move tools out of from_status with one conditional UPDATE, returning how many moved
+
+    The status check and the write happen in the same statement, so two
+    concurrent requests can never both claim the same tool.
+    """
+    result = db.session.execute(
+        update(Tool)
+        .where(Tool.id.in_(tool_ids), Tool.status == from_status)
+        .values(**values),
+        execution_options={'synchronize_session': False}
+    )
+    if result.rowcount:
+        # The UPDATE skips the ORM flush, so feed the counters and change log directly
+        connection = db.session.connection()
+        apply_deltas(connection, {
+            ('tool_by_status', from_status): -result.rowcount,
+            ('tool_by_status', values['status']): result.rowcount
+        })
+        record_changes(connection, 'tool', tool_ids, 'update')
+    return result.rowcount
+
+def _expected_return(data, now):
+    """Expected return time from the request, defaulting to TOOL_LOAN_HOURS after checkout"""
+    if data.get('expected_return_at'):
+        expected_return_at = parse_datetime(data['expected_return_at'])
+        if expected_return_at <= now:
+            raise ValueError('expected_return_at must be in the future')
+        return expected_return_at
+    hours = current_app.config.get('TOOL_LOAN_HOURS', 24)
+    return now + timedelta(hours=hours) if hours else None
+
+def _tool_conflict(tool_id, message, error):
+    """404 if the tool does not exist, otherwise a 409 for a lost status race"""
+    if db.session.get(Tool, tool_id) is None:
+        return jsonify({
+            'success': False,
+            'data': None,
+            'message': 'Tool not found',
+            'errors': [f'No tool with id {tool_id}']
+        }), 404
+    return jsonify({
+        'success': False,
+        'data': None,
+        'message': message,
+        'errors': [error]
+    }), 409
+
 @tool_bp.route('/tools/<int:tool_id>/checkout', methods=['POST'])
 def checkout_tool(tool_id):
     """Check out a tool to a user"""
     try:
-        tool = Tool.query.get_or_404(tool_id)
         data = request.json
-        
-        if tool.status != 'available':
-            return jsonify({
-                'success': False,
-                'data': None,
-                'message': 'Tool is not available for checkout',
-                'errors': ['Tool status must be available']
-            }), 400
-        
-        tool.status = 'in_use'
-        tool.checked_out_to = data['user_id']
-        tool.checked_out_at = datetime.utcnow()
-        tool.updated_at = datetime.utcnow()
-        
+        now = datetime.utcnow()
+        expected_return_at = _expected_return(data, now)
+
+        if not _transition_tools([tool_id], 'available', {
+            'status': 'in_use',
+            'checked_out_to': data['user_id'],
+            'checked_out_at': now,
+            'expected_return_at': expected_return_at,
+            'overdue_since': None,
+            'updated_at': now
+        }):
+            db.session.rollback()
+            return _tool_conflict(tool_id, 'Tool is not available for checkout', 'Tool status must be available')
+
+        tool_name = db.session.query(Tool.tool_name).filter_by(id=tool_id).scalar()
+        log_activity('tool_checkout', 'tool', tool_id, f'Tool checked out: {tool_name}', user_id=data['user_id'])
         db.session.commit()
+        sweeper.schedule(tool_id, expected_return_at)
+        tool = Tool.with_users().filter_by(id=tool_id).first()
+        broker.publish('tool_checkout', tool.to_dict())
         
         return jsonify({
             'success': True,
@@ -151,6 +313,7 @@ def checkout_tool(tool_id):
         })
         
     except Exception as e:
+        db.session.rollback()
         return jsonify({
             'success': False,
             'data': None,
@@ -162,22 +325,23 @@ def checkout_tool(tool_id):
 def checkin_tool(tool_id):
     """Check in a tool"""
     try:
-        tool = Tool.query.get_or_404(tool_id)
-        
-        if tool.status != 'in_use':
-            return jsonify({
-                'success': False,
-                'data': None,
-                'message': 'Tool is not checked out',
-                'errors': ['Tool status must be in_use']
-            }), 400
-        
-        tool.status = 'available'
-        tool.checked_out_to = None
-        tool.checked_out_at = None
-        tool.updated_at = datetime.utcnow()
-        
+        if not _transition_tools([tool_id], 'in_use', {
+            'status': 'available',
+            'checked_out_to': None,
+            'checked_out_at': None,
+            'expected_return_at': None,
+            'overdue_since': None,
+            'updated_at': datetime.utcnow()
+        }):
+            db.session.rollback()
+            return _tool_conflict(tool_id, 'Tool is not checked out', 'Tool status must be in_use')
+
+        tool_name = db.session.query(Tool.tool_name).filter_by(id=tool_id).scalar()
+        log_activity('tool_checkin', 'tool', tool_id, f'Tool checked in: {tool_name}',
+                     user_id=(request.get_json(silent=True) or {}).get('user_id'))
         db.session.commit()
+        tool = Tool.with_users().filter_by(id=tool_id).first()
+        broker.publish('tool_checkin', tool.to_dict())
         
         return jsonify({
             'success': True,
@@ -186,6 +350,7 @@ def checkin_tool(tool_id):
         })
         
     except Exception as e:
+        db.session.rollback()
         return jsonify({
             'success': False,
             'data': None,
@@ -193,3 +358,222 @@ def checkin_tool(tool_id):
             'errors': [str(e)]
         }), 400
 
+@tool_bp.route('/tools/checkout', methods=['POST'])
+def checkout_kit():
+    """Check out a kit of tools to a user, all or nothing"""
+    try:
+        data = request.json
+        tool_ids = list(dict.fromkeys(data.get('tool_ids') or []))
+        if not tool_ids:
+            return jsonify({
+                'success': False,
+                'data': None,
+                'message': 'Failed to checkout kit',
+                'errors': ['tool_ids must be a non-empty list']
+            }), 400
+
+        now = datetime.utcnow()
+        expected_return_at = _expected_return(data, now)
+        claimed = _transition_tools(tool_ids, 'available', {
+            'status': 'in_use',
+            'checked_out_to': data['user_id'],
+            'checked_out_at': now,
+            'expected_return_at': expected_return_at,
+            'overdue_since': None,
+            'updated_at': now
+        })
+        if claimed != len(tool_ids):
+            db.session.rollback()
+            statuses = dict(db.session.query(Tool.id, Tool.status).filter(Tool.id.in_(tool_ids)).all())
+            return jsonify({
+                'success': False,
+                'data': {
+                    'unavailable': [
+                        {'id': tool_id, 'status': statuses.get(tool_id, 'not_found')}
+                        for tool_id in tool_ids if statuses.get(tool_id) != 'available'
+                    ]
+                },
+                'message': 'Kit is not available for checkout',
+                'errors': ['Every tool in the kit must be available']
+            }), 409
+
+        log_activities([
+            {'activity_type': 'tool_checkout', 'entity': 'tool', 'entity_id': tool_id,
+             'description': f'Tool checked out: {tool_name}', 'user_id': data['user_id'], 'created_at': now}
+            for tool_id, tool_name in db.session.query(Tool.id, Tool.tool_name).filter(Tool.id.in_(tool_ids)).all()
+        ])
+        db.session.commit()
+        tools = Tool.with_users().filter(Tool.id.in_(tool_ids)).all()
+        for tool in tools:
+            sweeper.schedule(tool.id, expected_return_at)
+            broker.publish('tool_checkout', tool.to_dict())
+
+        return jsonify({
+            'success': True,
+            'data': [tool.to_dict() for tool in tools],
+            'message': f'Checked out {len(tools)} tools'
+        })
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({
+            'success': False,
+            'data': None,
+            'message': 'Failed to checkout kit',
+            'errors': [str(e)]
+        }), 400
+
+def _parse_period(source, start_key, end_key):
+    """Read an ISO start/end pair, raising ValueError unless start < end"""
+    if not source.get(start_key) or not source.get(end_key):
+        raise ValueError(f'{start_key} and {end_key} are required')
+    start = parse_datetime(source[start_key])
+    end = parse_datetime(source[end_key])
+    if start >= end:
+        raise ValueError(f'{start_key} must be before {end_key}')
+    return start, end
+
+@tool_bp.route('/tools/<int:tool_id>/reservations', methods=['GET'])
+def get_tool_reservations(tool_id):
+    """Get a tool's active reservations, optionally within a start/end window"""
+    Tool.query.get_or_404(tool_id)
+    try:
+        if request.args.get('start') or request.args.get('end'):
+            start, end = _parse_period(request.args, 'start', 'end')
+        else:
+            start, end = datetime.min, datetime.max
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'data': None,
+            'message': 'Invalid reservation window',
+            'errors': [str(e)]
+        }), 400
+
+    bookings = calendar.schedule(tool_id).overlapping(start, end)
+    return jsonify({
+        'success': True,
+        'data': [
+            {'id': reservation_id, 'tool_id': tool_id, 'starts_at': starts_at.isoformat(), 'ends_at': ends_at.isoformat()}
+            for starts_at, ends_at, reservation_id in bookings
+        ],
+        'message': f'Retrieved {len(bookings)} reservations'
+    })
+
+@tool_bp.route('/tools/<int:tool_id>/reservations', methods=['POST'])
+def create_tool_reservation(tool_id):
+    """Reserve a tool for a time range"""
+    try:
+        data = request.json
+        starts_at, ends_at = _parse_period(data, 'starts_at', 'ends_at')
+
+        # Touch the tool row first so concurrent bookings of this tool queue up
+        # behind our transaction instead of racing the overlap check
+        locked = db.session.execute(
+            update(Tool).where(Tool.id == tool_id).values(updated_at=Tool.updated_at, version=Tool.version),
+            execution_options={'synchronize_session': False}
+        ).rowcount
+        if not locked:
+            db.session.rollback()
+            return jsonify({
+                'success': False,
+                'data': None,
+                'message': 'Tool not found',
+                'errors': [f'No tool with id {tool_id}']
+            }), 404
+
+        conflicts = ToolReservation.query.filter(
+            ToolReservation.tool_id == tool_id,
+            ToolReservation.status == 'active',
+            ToolReservation.ends_at > starts_at,
+            ToolReservation.starts_at < ends_at
+        ).all()
+        if conflicts:
+            db.session.rollback()
+            return jsonify({
+                'success': False,
+                'data': {'conflicts': [reservation.to_dict() for reservation in conflicts]},
+                'message': 'Tool is already reserved for part of this period',
+                'errors': ['Reservation overlaps an existing booking']
+            }), 409
+
+        reservation = ToolReservation(
+            tool_id=tool_id,
+            reserved_by=data['reserved_by'],
+            starts_at=starts_at,
+            ends_at=ends_at,
+            purpose=data.get('purpose')
+        )
+        db.session.add(reservation)
+        db.session.commit()
+        calendar.add(reservation)
+
+        return jsonify({
+            'success': True,
+            'data': reservation.to_dict(),
+            'message': 'Tool reserved successfully'
+        }), 201
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({
+            'success': False,
+            'data': None,
+            'message': 'Failed to reserve tool',
+            'errors': [str(e)]
+        }), 400
+
+@tool_bp.route('/tools/<int:tool_id>/reservations/<int:reservation_id>', methods=['DELETE'])
+def cancel_tool_reservation(tool_id, reservation_id):
+    """Cancel a tool reservation"""
+    reservation = ToolReservation.query.filter_by(id=reservation_id, tool_id=tool_id).first_or_404()
+    try:
+        reservation.status = 'cancelled'
+        db.session.commit()
+        calendar.remove(reservation)
+
+        return jsonify({
+            'success': True,
+            'data': reservation.to_dict(),
+            'message': 'Reservation cancelled successfully'
+        })
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({
+            'success': False,
+            'data': None,
+            'message': 'Failed to cancel reservation',
+            'errors': [str(e)]
+        }), 400
+
+@tool_bp.route('/tools/availability', methods=['GET'])
+def get_tool_availability():
+    """Get tools, optionally of one category, that are free for a whole start/end window"""
+    try:
+        start, end = _parse_period(request.args, 'start', 'end')
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'data': None,
+            'message': 'Invalid availability window',
+            'errors': [str(e)]
+        }), 400
+
+    query = Tool.with_users().filter(Tool.status.in_(['available', 'in_use']))
+    if request.args.get('category'):
+        query = query.filter(Tool.tool_category == request.args['category'])
+    tools = query.order_by(Tool.id).all()
+
+    now = datetime.utcnow()
+    schedules = calendar.schedules([tool.id for tool in tools])
+    free = [
+        tool for tool in tools
+        # A tool checked out right now can't be promised for a window that has already begun
+        if not (tool.status == 'in_use' and start <= now) and schedules[tool.id].is_free(start, end)
+    ]
+    return jsonify({
+        'success': True,
+        'data': [tool.to_dict() for tool in free],
+        'message': f'{len(free)} tools available'
+    })
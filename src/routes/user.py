@@ -1,12 +1,21 @@
 from flask import Blueprint, jsonify, request
 from src.models.user import User, db
+from src.utils.pagination import get_page_args, paginate
 
 user_bp = Blueprint('user', __name__)
 
 @user_bp.route('/users', methods=['GET'])
 def get_users():
-    users = User.query.all()
-    return jsonify([user.to_dict() for user in users])
+    try:
+        limit, after = get_page_args(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    users, next_cursor = paginate(User.query, User, limit, after)
+    response = jsonify([user.to_dict() for user in users])
+    if next_cursor:
+        response.headers['X-Next-Cursor'] = next_cursor
+    return response
 
 @user_bp.route('/users', methods=['POST'])
 def create_user():
@@ -0,0 +1,82 @@
+from datetime import datetime
+from sqlalchemy import insert
+from src.models.user import User, db
+from src.models.activity import ActivityLog
+
+
+def _user_names(user_ids):
+    user_ids = {user_id for user_id in user_ids if user_id}
+    if not user_ids:
+        return {}
+    with db.session.no_autoflush:
+        return dict(db.session.query(User.id, User.username).filter(User.id.in_(user_ids)).all())
+
+
+def log_activity(activity_type, entity, entity_id, description, user_id=None, provider_id=None, created_at=None):
+    """Add an activity to the current session so it commits with the change it describes"""
+    activity = ActivityLog(
+        activity_type=activity_type,
+        entity=entity,
+        entity_id=entity_id,
+        description=description[:300],
+        user_id=user_id,
+        user_name=_user_names([user_id]).get(user_id),
+        provider_id=provider_id,
+        created_at=created_at or datetime.utcnow()
+    )
+    db.session.add(activity)
+    return activity
+
+
+def log_activities(rows):
+    """Insert many activity dicts in one executemany, for bulk writers"""
+    if not rows:
+        return
+    names = _user_names(row.get('user_id') for row in rows)
+    now = datetime.utcnow()
+    db.session.execute(insert(ActivityLog), [
+        {
+            'activity_type': row['activity_type'],
+            'entity': row['entity'],
+            'entity_id': row.get('entity_id'),
+            'description': row['description'][:300],
+            'user_id': row.get('user_id'),
+            'user_name': names.get(row.get('user_id')),
+            'provider_id': row.get('provider_id'),
+            'created_at': row.get('created_at', now)
+        }
+        for row in rows
+    ])
+
+
+def backfill_activity_log(batch_size=1000):
+    """Seed an empty activity log from existing tickets, checkouts and provider activities"""
+    if db.session.query(ActivityLog.id).first() is not None:
+        return
+    from src.models.ticket import Ticket
+    from src.models.tool import Tool
+    from src.models.service_provider import ProviderActivity
+
+    sources = [
+        (db.session.query(Ticket.id, Ticket.title, Ticket.created_by, Ticket.created_at),
+         lambda row: {'activity_type': 'ticket_created', 'entity': 'ticket', 'entity_id': row.id,
+                      'description': f'New ticket created: {row.title}', 'user_id': row.created_by,
+                      'created_at': row.created_at}),
+        (db.session.query(Tool.id, Tool.tool_name, Tool.checked_out_to, Tool.checked_out_at)
+         .filter(Tool.status == 'in_use', Tool.checked_out_at.isnot(None)),
+         lambda row: {'activity_type': 'tool_checkout', 'entity': 'tool', 'entity_id': row.id,
+                      'description': f'Tool checked out: {row.tool_name}', 'user_id': row.checked_out_to,
+                      'created_at': row.checked_out_at}),
+        (db.session.query(ProviderActivity.provider_id, ProviderActivity.activity_type, ProviderActivity.description,
+                          ProviderActivity.activity_date, ProviderActivity.created_at),
+         lambda row: {'activity_type': row.activity_type, 'entity': 'service_provider', 'entity_id': row.provider_id,
+                      'description': row.description, 'provider_id': row.provider_id,
+                      'created_at': row.activity_date or row.created_at}),
+    ]
+    for query, to_activity in sources:
+        # Plain column tuples; the cursor is drained before inserting since not
+        # every driver allows writes while a result set is still open
+        rows = query.all()
+        for start in range(0, len(rows), batch_size):
+            log_activities([to_activity(row) for row in rows[start:start + batch_size]])
+    db.session.commit()
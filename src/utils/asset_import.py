@@ -0,0 +1,296 @@
+import csv
+import io
+from datetime import date, datetime
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import bindparam, insert, select, update
+from src.models.user import User, db
+from src.models.asset import Asset
+from src.utils.asset_index import asset_index
+from src.utils.changes import record_changes
+from src.utils.counters import apply_deltas
+from src.utils.locations import resolve_location_ids
+from src.utils.activity import log_activity
+
+DEFAULT_BATCH_SIZE = 1000
+MAX_REPORTED_ERRORS = 1000
+
+# Audit template columns (see create_sample_facilities_assets) and plain
+# Asset field names, normalized to lowercase without spaces or underscores
+COLUMN_MAP = {
+    'serialbarcode': 'asset_tag',
+    'assettag': 'asset_tag',
+    'description': 'name',
+    'name': 'name',
+    'notes': 'description',
+    'assettype': 'category',
+    'category': 'category',
+    'condition': 'condition',
+    'purchasedate': 'purchase_date',
+    'warrantyexpiry': 'warranty_expiry',
+    'inspectiondue': 'inspection_due',
+    'assignedto': 'assigned_to',
+    'location': 'location',
+    'building': 'building',
+    'floor': 'floor',
+    'roomarea': 'room_area',
+}
+
+CONDITION_MAP = {
+    'excellent': 'good',
+    'good': 'good',
+    'fair': 'fair',
+    'poor': 'needs_repair',
+    'needs repair': 'needs_repair',
+    'needs_repair': 'needs_repair',
+    'broken': 'broken',
+}
+
+LOCATION_PARTS = ('building', 'floor', 'room_area')
+
+
+class ImportAborted(Exception):
+    """A batch failed to write; summary covers the batches already committed"""
+
+    def __init__(self, message, summary):
+        super().__init__(message)
+        self.summary = summary
+
+
+def _normalize_header(header):
+    return str(header or '').strip().lower().replace(' ', '').replace('_', '')
+
+
+def _parse_date(value):
+    if value in (None, ''):
+        return None
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return datetime.strptime(str(value).strip()[:10], '%Y-%m-%d').date()
+
+
+def _clean(value):
+    if value is None:
+        return None
+    value = str(value).strip() if not isinstance(value, (date, datetime)) else value
+    return value if value != '' else None
+
+
+def read_rows(stream, filename):
+    """Yield (row_number, {header: value}) from a CSV or XLSX upload, one row at a time"""
+    if filename.lower().endswith(('.xlsx', '.xlsm')):
+        try:
+            from openpyxl import load_workbook
+        except ImportError as e:
+            raise ValueError('openpyxl is required to import .xlsx files') from e
+        workbook = load_workbook(stream, read_only=True, data_only=True)
+        try:
+            rows = workbook.active.iter_rows(values_only=True)
+            headers = next(rows, None) or []
+            for number, values in enumerate(rows, start=2):
+                if any(value not in (None, '') for value in values):
+                    yield number, dict(zip(headers, values))
+        finally:
+            workbook.close()
+    else:
+        if isinstance(stream, io.TextIOBase):
+            text_stream = stream
+        else:
+            text_stream = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+        for number, row in enumerate(csv.DictReader(text_stream), start=2):
+            yield number, row
+
+
+def map_row(row, user_ids, warnings=None):
+    """Map one template row onto Asset column values, raising ValueError if invalid
+
+    Problems that do not stop the row from importing are appended to
+    warnings when a list is given.
+    """
+    values = {}
+    for header, value in row.items():
+        field = COLUMN_MAP.get(_normalize_header(header))
+        if field:
+            values[field] = _clean(value)
+
+    if not values.get('asset_tag'):
+        raise ValueError('SerialBarcode is required')
+    if not values.get('name'):
+        raise ValueError('Description is required')
+
+    mapped = {'asset_tag': values['asset_tag'], 'name': values['name']}
+    for field in ('description', 'category'):
+        if field in values:
+            mapped[field] = values[field]
+
+    if 'condition' in values:
+        condition = (values['condition'] or 'good').lower()
+        if condition not in CONDITION_MAP:
+            raise ValueError(f"Unknown condition '{values['condition']}'")
+        mapped['condition'] = CONDITION_MAP[condition]
+
+    for field in ('purchase_date', 'warranty_expiry', 'inspection_due'):
+        if field in values:
+            try:
+                mapped[field] = _parse_date(values[field])
+            except ValueError as e:
+                raise ValueError(f'{field} must be a YYYY-MM-DD date') from e
+
+    if any(part in values for part in LOCATION_PARTS):
+        parts = [values.get(part) for part in LOCATION_PARTS]
+        mapped['location'] = ' / '.join(part for part in parts if part) or None
+    elif 'location' in values:
+        mapped['location'] = values['location']
+
+    if values.get('assigned_to'):
+        # The templates name a person or team; only usernames resolve to a user.
+        # Anything else leaves the column alone so a re-import keeps the assignee.
+        if values['assigned_to'] in user_ids:
+            mapped['assigned_to'] = user_ids[values['assigned_to']]
+        elif warnings is not None:
+            warnings.append(f"AssignedTo '{values['assigned_to']}' is not a username; assignee left unchanged")
+
+    return mapped
+
+
+def _write_batch(batch, summary):
+    """Upsert one batch of mapped rows keyed by asset_tag"""
+    table = Asset.__table__
+    existing = {
+        row.asset_tag: row
+        for row in db.session.execute(
+            select(table.c.id, table.c.asset_tag, table.c.condition).where(table.c.asset_tag.in_(list(batch)))
+        )
+    }
+
+    # Link locations into the tree; subtree counts for imported rows are
+    # left to the periodic reconciliation
+    located = [row for row in batch.values() if 'location' in row]
+    if located:
+        location_ids = resolve_location_ids(db.session, [row['location'] for row in located])
+        for row in located:
+            row['location_id'] = location_ids.get(row['location'])
+
+    now = datetime.utcnow()
+    inserts = [dict(row) for tag, row in batch.items() if tag not in existing]
+    updates = [dict(row, b_tag=tag, updated_at=now) for tag, row in batch.items() if tag in existing]
+    connection = db.session.connection()
+    deltas = {}
+
+    if inserts:
+        for rows in _group_by_columns(inserts).values():
+            new_ids = connection.execute(
+                insert(table).returning(table.c.id, sort_by_parameter_order=True), rows
+            ).scalars().all()
+            record_changes(connection, 'asset', new_ids, 'create')
+        for row in inserts:
+            key = ('asset_by_condition', row.get('condition', 'good'))
+            deltas[key] = deltas.get(key, 0) + 1
+
+    if updates:
+        for columns, rows in _group_by_columns(updates).items():
+            values = {column: bindparam(column) for column in columns if column not in ('asset_tag', 'b_tag')}
+            connection.execute(update(table).where(table.c.asset_tag == bindparam('b_tag')).values(values), rows)
+        record_changes(connection, 'asset', [existing[row['b_tag']].id for row in updates], 'update')
+        for row in updates:
+            old, new = existing[row['b_tag']].condition, row.get('condition')
+            if new is not None and new != old:
+                deltas[('asset_by_condition', old)] = deltas.get(('asset_by_condition', old), 0) - 1
+                deltas[('asset_by_condition', new)] = deltas.get(('asset_by_condition', new), 0) + 1
+
+    apply_deltas(connection, {key: delta for key, delta in deltas.items() if delta})
+    db.session.commit()
+    asset_index.discard(batch)
+
+    summary['created'] += len(inserts)
+    summary['updated'] += len(updates)
+
+
+def _group_by_columns(rows):
+    """Group rows by key set so each group can go out as one executemany"""
+    groups = {}
+    for row in rows:
+        groups.setdefault(tuple(sorted(row)), []).append(row)
+    return groups
+
+
+def _write_or_abort(batch, summary):
+    try:
+        _write_batch(batch, summary)
+    except Exception as e:
+        db.session.rollback()
+        if summary['created'] or summary['updated']:
+            log_activity('asset_import', 'asset', None,
+                         f"Assets import stopped early: {summary['created']} created, "
+                         f"{summary['updated']} updated before a batch failed")
+            db.session.commit()
+        raise ImportAborted(str(e), summary) from e
+
+
+def import_assets(rows, batch_size=DEFAULT_BATCH_SIZE, progress=None):
+    """Validate and upsert (row_number, row) pairs by asset_tag in batches
+
+    Only one batch is held in memory at a time. progress, if given, is called
+    with the running summary after every batch. Each batch commits on its
+    own; if one fails, ImportAborted carries the summary of those before it.
+    """
+    user_ids = dict(db.session.query(User.username, User.id).all())
+    summary = {'processed': 0, 'created': 0, 'updated': 0, 'failed': 0, 'errors': [], 'warnings': []}
+    batch = {}
+
+    for number, row in rows:
+        summary['processed'] += 1
+        warnings = []
+        try:
+            mapped = map_row(row, user_ids, warnings)
+        except ValueError as e:
+            summary['failed'] += 1
+            if len(summary['errors']) < MAX_REPORTED_ERRORS:
+                summary['errors'].append({'row': number, 'errors': [str(e)]})
+            continue
+        if warnings and len(summary['warnings']) < MAX_REPORTED_ERRORS:
+            summary['warnings'].append({'row': number, 'warnings': warnings})
+
+        # A tag repeated within a batch keeps its last row
+        batch[mapped['asset_tag']] = mapped
+        if len(batch) >= batch_size:
+            _write_or_abort(batch, summary)
+            batch = {}
+            if progress:
+                progress(summary)
+
+    if batch:
+        _write_or_abort(batch, summary)
+    if summary['created'] or summary['updated']:
+        log_activity('asset_import', 'asset', None,
+                     f"Assets imported: {summary['created']} created, {summary['updated']} updated, "
+                     f"{summary['failed']} failed")
+        db.session.commit()
+    if progress:
+        progress(summary)
+    return summary
+
+
+@click.command('import-assets')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--batch-size', default=DEFAULT_BATCH_SIZE, show_default=True, help='Rows per upsert batch')
+@with_appcontext
+def import_assets_command(path, batch_size):
+    """Import assets from a CSV or XLSX audit template"""
+    def report(summary):
+        click.echo(f"{summary['processed']} rows processed "
+                   f"({summary['created']} created, {summary['updated']} updated, {summary['failed']} failed)")
+
+    with open(path, 'rb') as stream:
+        try:
+            summary = import_assets(read_rows(stream, path), batch_size=batch_size, progress=report)
+        except ImportAborted as e:
+            report(e.summary)
+            raise click.ClickException(f'Import stopped, later rows were not written: {e}') from e
+
+    for error in summary['errors']:
+        click.echo(f"Row {error['row']}: {'; '.join(error['errors'])}", err=True)
+    for warning in summary['warnings']:
+        click.echo(f"Row {warning['row']}: {'; '.join(warning['warnings'])}", err=True)
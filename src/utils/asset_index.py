@@ -0,0 +1,99 @@
+import threading
+import time
+from collections import OrderedDict
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+from src.models.asset import Asset
+
+
+class AssetTagIndex:
+    """LRU map of asset_tag -> serialized asset for the barcode scan path
+
+    Entries are dropped when an asset commits a change (including a change of
+    tag) and refreshed by the write routes. The ttl bounds how stale an entry
+    can get when another worker process made the change.
+    """
+
+    def __init__(self, maxsize=50000, ttl=300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._tags = {}  # asset id -> tag, so a re-tagged asset's old entry can be dropped
+
+    def get(self, tag):
+        with self._lock:
+            entry = self._entries.get(tag)
+            if entry is None:
+                return None
+            data, stored_at = entry
+            if self.ttl and time.monotonic() - stored_at > self.ttl:
+                self._pop(tag)
+                return None
+            self._entries.move_to_end(tag)
+            return data
+
+    def _pop(self, tag):
+        entry = self._entries.pop(tag, None)
+        if entry is not None and self._tags.get(entry[0]['id']) == tag:
+            del self._tags[entry[0]['id']]
+
+    def put(self, data):
+        with self._lock:
+            previous = self._tags.get(data['id'])
+            if previous is not None and previous != data['asset_tag']:
+                self._pop(previous)
+            self._entries[data['asset_tag']] = (data, time.monotonic())
+            self._entries.move_to_end(data['asset_tag'])
+            self._tags[data['id']] = data['asset_tag']
+            while len(self._entries) > self.maxsize:
+                self._pop(next(iter(self._entries)))
+
+    def discard(self, tags):
+        with self._lock:
+            for tag in tags:
+                self._pop(tag)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._tags.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+asset_index = AssetTagIndex()
+
+
+def warm_asset_index(app):
+    """Fill the index with the most recently updated assets, up to its size limit"""
+    asset_index.maxsize = app.config.get('ASSET_INDEX_SIZE', asset_index.maxsize)
+    asset_index.ttl = app.config.get('ASSET_INDEX_TTL', asset_index.ttl)
+    with app.app_context():
+        assets = (Asset.with_users()
+                  .order_by(Asset.updated_at.desc())
+                  .limit(asset_index.maxsize))
+        serialized = [asset.to_dict() for asset in assets]
+    # Insert oldest first so the most recently updated assets are evicted last
+    for data in reversed(serialized):
+        asset_index.put(data)
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_stale_tags(session, flush_context):
+    tags = session.info.setdefault('stale_asset_tags', set())
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, Asset):
+            history = inspect(obj).attrs.asset_tag.history
+            tags.update(tag for tag in history.sum() if tag)
+
+
+@event.listens_for(Session, 'after_commit')
+def _drop_stale_tags(session):
+    asset_index.discard(session.info.pop('stale_asset_tags', ()))
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _forget_stale_tags(session, previous_transaction):
+    session.info.pop('stale_asset_tags', None)
@@ -0,0 +1,45 @@
+from datetime import datetime
+from sqlalchemy import event, insert
+from sqlalchemy.orm import Session
+from src.models.ticket import Ticket
+from src.models.asset import Asset
+from src.models.tool import Tool
+from src.models.change_log import ChangeLog
+
+# Models whose writes are published on the change feed, by feed entity name
+TRACKED_ENTITIES = {
+    'ticket': Ticket,
+    'asset': Asset,
+    'tool': Tool,
+}
+
+
+def _entity_name(obj):
+    for name, model in TRACKED_ENTITIES.items():
+        if isinstance(obj, model):
+            return name
+    return None
+
+
+def record_changes(connection, entity, ids, action):
+    """Append change log entries for writes that bypass the ORM flush"""
+    now = datetime.utcnow()
+    rows = [{'entity': entity, 'entity_id': entity_id, 'action': action, 'changed_at': now} for entity_id in ids]
+    if rows:
+        connection.execute(insert(ChangeLog.__table__), rows)
+
+
+@event.listens_for(Session, 'after_flush')
+def _write_change_log(session, flush_context):
+    now = datetime.utcnow()
+    rows = []
+    for objects, action in ((session.new, 'create'), (session.dirty, 'update'), (session.deleted, 'delete')):
+        for obj in objects:
+            entity = _entity_name(obj)
+            if entity is None:
+                continue
+            if action == 'update' and (obj in session.deleted or not session.is_modified(obj)):
+                continue
+            rows.append({'entity': entity, 'entity_id': obj.id, 'action': action, 'changed_at': now})
+    if rows:
+        session.connection().execute(insert(ChangeLog.__table__), rows)
@@ -0,0 +1,69 @@
+import gzip
+from flask import request
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always offered
+    brotli = None
+
+# Bodies smaller than this are not worth the CPU or the extra headers
+COMPRESS_MIN_SIZE = 1024
+COMPRESSIBLE_TYPES = ('application/json', 'application/javascript', 'application/xml', 'image/svg+xml')
+# Dynamic responses favour speed; static files are compressed once at the highest level
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+
+def available_encodings():
+    """Content codings this process can produce, most preferred first"""
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def is_compressible(mimetype):
+    return bool(mimetype) and (mimetype.startswith('text/') or mimetype in COMPRESSIBLE_TYPES)
+
+
+def encode(data, encoding, best=False):
+    """Compress data with gzip or br"""
+    if encoding == 'br':
+        return brotli.compress(data, quality=11 if best else BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=9 if best else GZIP_LEVEL, mtime=0)
+
+
+def negotiate(offered):
+    """The coding among offered the client accepts most, or None for identity"""
+    accepted = request.accept_encodings
+    best = accepted.best_match(offered) if offered else None
+    return best if best and accepted[best] > 0 else None
+
+
+def compress_response(response):
+    """after_request hook: gzip or brotli large buffered responses the client can decode
+
+    Streamed responses (exports, the event stream), files, responses that
+    already carry a Content-Encoding and ones that negotiated encoding
+    themselves (Vary: Accept-Encoding) are passed through untouched.
+    """
+    if (response.status_code != 200 or response.is_streamed or response.direct_passthrough
+            or 'Content-Encoding' in response.headers or 'accept-encoding' in response.vary
+            or not is_compressible(response.mimetype)):
+        return response
+    data = response.get_data()
+    if len(data) < COMPRESS_MIN_SIZE:
+        return response
+
+    response.vary.add('Accept-Encoding')
+    encoding = negotiate(available_encodings())
+    if encoding is None:
+        return response
+    response.set_data(encode(data, encoding))
+    response.headers['Content-Encoding'] = encoding
+    # The encoded bytes are a different representation, so a strong ETag no longer applies
+    tag = response.headers.get('ETag')
+    if tag and not tag.startswith('W/'):
+        response.headers['ETag'] = 'W/' + tag
+    return response
+
+
+def init_compression(app):
+    app.after_request(compress_response)
@@ -0,0 +1,60 @@
+from sqlalchemy import update
+from src.models.user import db
+from src.utils.changes import TRACKED_ENTITIES, record_changes
+from src.utils.counters import move_counters
+from src.utils.locations import move_location_counts
+
+
+def etag(version):
+    """Strong ETag for a row version"""
+    return f'"{version}"'
+
+
+def if_match_version(headers):
+    """Read the version a write expects from its If-Match header
+
+    Returns None for '*' (write whatever the current version is). Raises
+    LookupError when the header is missing and ValueError when it is not an
+    ETag issued by this API.
+    """
+    value = (headers.get('If-Match') or '').strip()
+    if not value:
+        raise LookupError('If-Match header is required; send the ETag from your last read')
+    if value == '*':
+        return None
+    if value.startswith('W/'):
+        value = value[2:]
+    try:
+        return int(value.strip('"'))
+    except ValueError as e:
+        raise ValueError('If-Match must be an ETag returned by this API') from e
+
+
+def conditional_update(model, row_id, version, values):
+    """Write values to one row with a single UPDATE ... WHERE id = ? AND version = ?
+
+    Returns (row, None) on success, the row loaded from RETURNING with its
+    version bumped. On failure the transaction is rolled back and the result
+    is (None, current_version), where current_version is None when the row
+    does not exist.
+    """
+    connection = db.session.connection()
+    move_counters(connection, model, row_id, values, version)
+    if 'location_id' in values:
+        move_location_counts(connection, model, row_id, values['location_id'])
+
+    conditions = [model.id == row_id]
+    if version is not None:
+        conditions.append(model.version == version)
+    row = db.session.execute(
+        update(model).where(*conditions).values(**values, version=model.version + 1).returning(model),
+        execution_options={'synchronize_session': False, 'populate_existing': True}
+    ).scalars().first()
+
+    if row is None:
+        db.session.rollback()
+        return None, db.session.query(model.version).filter(model.id == row_id).scalar()
+    for entity, tracked in TRACKED_ENTITIES.items():
+        if tracked is model:
+            record_changes(connection, entity, [row_id], 'update')
+    return row, None
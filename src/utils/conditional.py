@@ -0,0 +1,92 @@
+import hashlib
+from datetime import datetime
+from functools import wraps
+from flask import make_response, request
+from sqlalchemy import event, insert, update
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.dml import UpdateBase
+from src.models.table_version import TableVersion
+
+# Tables written by the current transaction, kept on the DBAPI connection
+_TOUCHED_KEY = 'touched_tables'
+
+
+@event.listens_for(Engine, 'after_execute')
+def _note_written_table(connection, clauseelement, multiparams, params, execution_options, result):
+    # Catches ORM flushes and Core bulk statements alike, since both end up here
+    if isinstance(clauseelement, UpdateBase):
+        name = getattr(clauseelement.table, 'name', None)
+        if name and name != TableVersion.__tablename__:
+            connection.info.setdefault(_TOUCHED_KEY, set()).add(name)
+
+
+@event.listens_for(Engine, 'commit')
+@event.listens_for(Engine, 'rollback')
+def _forget_written_tables(connection):
+    connection.info.pop(_TOUCHED_KEY, None)
+
+
+@event.listens_for(Session, 'before_commit')
+def _bump_written_tables(session):
+    # Flush first so the commit's own pending writes are counted too
+    session.flush()
+    connection = session.connection()
+    names = connection.info.pop(_TOUCHED_KEY, None)
+    if names:
+        bump_versions(connection, names)
+
+
+def bump_versions(connection, names):
+    """Move the given tables' versions forward on the connection's transaction"""
+    table = TableVersion.__table__
+    now = datetime.utcnow()
+    for name in sorted(names):
+        result = connection.execute(
+            update(table)
+            .where(table.c.table_name == name)
+            .values(version=table.c.version + 1, updated_at=now)
+        )
+        if result.rowcount == 0:
+            connection.execute(insert(table).values(table_name=name, version=1, updated_at=now))
+
+
+def read_versions(names):
+    """Return {table_name: (version, updated_at)} for the given tables"""
+    rows = TableVersion.query.filter(TableVersion.table_name.in_(names)).all()
+    versions = {name: (0, None) for name in names}
+    versions.update((row.table_name, (row.version, row.updated_at)) for row in rows)
+    return versions
+
+
+def collection_etag(names):
+    """Opaque (unquoted) weak ETag value for the current request over the given tables
+
+    Built from the tables' versions plus the path and query string, so it
+    changes whenever any of the tables is written or the request asks for a
+    different page or filter, without reading a single data row.
+    """
+    key = repr((request.path, sorted(request.args.items(multi=True)), sorted(read_versions(names).items())))
+    return hashlib.sha1(key.encode()).hexdigest()[:20]
+
+
+def conditional_get(*models):
+    """Answer If-None-Match with 304 before the view runs when the tables have not changed
+
+    models are the models whose tables the view's response is built from.
+    """
+    names = tuple(model.__table__.name for model in models)
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            tag = collection_etag(names)
+            headers = {'ETag': f'W/"{tag}"', 'Cache-Control': 'no-cache'}
+            if request.if_none_match.contains_weak(tag):
+                return make_response('', 304, headers)
+            response = make_response(view(*args, **kwargs))
+            if response.status_code == 200:
+                response.headers.update(headers)
+            return response
+        return wrapper
+    return decorator
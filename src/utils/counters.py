@@ -0,0 +1,183 @@
+import threading
+from collections import defaultdict
+from sqlalchemy import event, func, inspect, select, update, insert, delete
+from sqlalchemy.orm import Session
+from src.models.user import db
+from src.models.ticket import Ticket
+from src.models.asset import Asset
+from src.models.tool import Tool
+from src.models.staff import Staff
+from src.models.dashboard_counter import DashboardCounter
+
+# Grouped counters kept for the dashboard: metric name -> (model, grouped column)
+TRACKED_COUNTERS = {
+    'ticket_by_status': (Ticket, 'status'),
+    'ticket_by_priority': (Ticket, 'priority'),
+    'asset_by_condition': (Asset, 'condition'),
+    'tool_by_status': (Tool, 'status'),
+    'staff_by_status': (Staff, 'status'),
+}
+
+_reconciler = None
+
+
+def _noop(target, value, oldvalue, initiator):
+    pass
+
+
+# active_history makes SQLAlchemy load the previous value before an expired
+# attribute is overwritten, so the flush hook always knows which bucket a row
+# is leaving.
+for _model, _column in TRACKED_COUNTERS.values():
+    event.listen(getattr(_model, _column), 'set', _noop, active_history=True)
+
+
+def _previous_value(state, column):
+    history = state.attrs[column].history
+    if history.deleted:
+        return history.deleted[0]
+    if history.unchanged:
+        return history.unchanged[0]
+    return None
+
+
+def _current_value(state, column):
+    history = state.attrs[column].history
+    if history.added:
+        return history.added[0]
+    return _previous_value(state, column)
+
+
+def collect_deltas(session):
+    """Work out how the pending flush moves rows between counter buckets"""
+    deltas = defaultdict(int)
+    for metric, (model, column) in TRACKED_COUNTERS.items():
+        for obj in session.new:
+            if isinstance(obj, model):
+                deltas[(metric, _current_value(inspect(obj), column))] += 1
+        for obj in session.deleted:
+            if isinstance(obj, model):
+                deltas[(metric, _previous_value(inspect(obj), column))] -= 1
+        for obj in session.dirty:
+            if isinstance(obj, model) and obj not in session.deleted:
+                state = inspect(obj)
+                if not state.attrs[column].history.has_changes():
+                    continue
+                old, new = _previous_value(state, column), _current_value(state, column)
+                if old != new:
+                    deltas[(metric, old)] -= 1
+                    deltas[(metric, new)] += 1
+    return {key: delta for key, delta in deltas.items() if delta and key[1] is not None}
+
+
+def apply_deltas(connection, deltas):
+    """Add deltas to the counter rows on the given connection's transaction
+
+    Writes that bypass the ORM (bulk UPDATEs and the like) should call this
+    with their own deltas so the counters stay exact between reconciliations.
+    """
+    table = DashboardCounter.__table__
+    for (metric, bucket), delta in deltas.items():
+        result = connection.execute(
+            update(table)
+            .where(table.c.metric == metric, table.c.bucket == bucket)
+            .values(count=table.c.count + delta)
+        )
+        if result.rowcount == 0:
+            connection.execute(insert(table).values(metric=metric, bucket=bucket, count=delta))
+
+
+def move_counters(connection, model, row_id, values, version=None):
+    """Shift the counters of one row that a Core UPDATE is about to give new values
+
+    The row's current bucket is read by a subquery inside the decrement, so
+    no SELECT round trip is needed. Call it before the row's UPDATE in the
+    same transaction; if that UPDATE matches nothing, roll back.
+    """
+    table = DashboardCounter.__table__
+    for metric, (tracked, column) in TRACKED_COUNTERS.items():
+        if tracked is not model or column not in values:
+            continue
+        current = select(getattr(model, column)).where(model.id == row_id)
+        if version is not None:
+            current = current.where(model.version == version)
+        connection.execute(
+            update(table)
+            .where(table.c.metric == metric, table.c.bucket == current.scalar_subquery())
+            .values(count=table.c.count - 1)
+        )
+        if values[column] is not None:
+            apply_deltas(connection, {(metric, values[column]): 1})
+
+
+@event.listens_for(Session, 'after_flush')
+def _write_counter_deltas(session, flush_context):
+    # new/dirty/deleted and attribute history still describe the flush here,
+    # and Python-side column defaults have been filled in on new rows
+    deltas = collect_deltas(session)
+    if deltas:
+        apply_deltas(session.connection(), deltas)
+
+
+def read_counters():
+    """Return {metric: {bucket: count}} from the counter table"""
+    counters = {metric: {} for metric in TRACKED_COUNTERS}
+    for row in DashboardCounter.query.filter(DashboardCounter.count > 0).all():
+        counters.setdefault(row.metric, {})[row.bucket] = row.count
+    return counters
+
+
+def reconcile_counters():
+    """Recompute every counter from the source tables and overwrite drift
+
+    Only rows whose count is wrong are written, so when nothing drifted the
+    counter table and its version (and with it the stats ETag) stay as they are.
+    """
+    table = DashboardCounter.__table__
+    expected = {}
+    for metric, (model, column) in TRACKED_COUNTERS.items():
+        grouped = getattr(model, column)
+        rows = db.session.query(grouped, func.count(model.id)).group_by(grouped).all()
+        expected.update(((metric, bucket), count) for bucket, count in rows if bucket is not None)
+    stored = {(row.metric, row.bucket): row.count for row in db.session.query(table).all()}
+
+    connection = db.session.connection()
+    for (metric, bucket), count in stored.items():
+        # A zero row reads the same as a missing one, so it is left in place
+        if metric not in TRACKED_COUNTERS:
+            connection.execute(delete(table).where(table.c.metric == metric, table.c.bucket == bucket))
+        elif count != expected.get((metric, bucket), 0):
+            connection.execute(
+                update(table)
+                .where(table.c.metric == metric, table.c.bucket == bucket)
+                .values(count=expected.get((metric, bucket), 0))
+            )
+    for (metric, bucket), count in expected.items():
+        if (metric, bucket) not in stored:
+            connection.execute(insert(table).values(metric=metric, bucket=bucket, count=count))
+    db.session.commit()
+
+
+def start_reconciler(app, interval, jobs=(reconcile_counters,)):
+    """Run the reconciliation jobs once now, then every interval seconds on a daemon thread"""
+    global _reconciler
+    with app.app_context():
+        for job in jobs:
+            job()
+    if _reconciler is not None or not interval:
+        return
+
+    stopped = threading.Event()
+
+    def run():
+        while not stopped.wait(interval):
+            with app.app_context():
+                for job in jobs:
+                    try:
+                        job()
+                    except Exception as e:
+                        db.session.rollback()
+                        app.logger.warning('Reconciliation job %s failed: %s', job.__name__, e)
+
+    _reconciler = threading.Thread(target=run, name='dashboard-counter-reconciler', daemon=True)
+    _reconciler.start()
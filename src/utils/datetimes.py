@@ -0,0 +1,15 @@
+from datetime import datetime, timezone
+
+
+def parse_datetime(value):
+    """Parse an ISO datetime into the naive UTC the tables store
+
+    Offset-aware input such as 2026-11-01T10:00:00Z is converted to UTC
+    first. Raises ValueError for anything that is not an ISO datetime string.
+    """
+    if not isinstance(value, str):
+        raise ValueError(f'{value!r} is not an ISO datetime')
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
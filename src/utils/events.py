@@ -0,0 +1,118 @@
+import itertools
+import json
+import queue
+import sys
+import threading
+from collections import deque
+from datetime import datetime
+
+
+class Subscriber:
+    """One stream client's bounded inbox"""
+
+    def __init__(self, types=None, maxsize=256):
+        self.types = set(types) if types else None
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.overflowed = False
+
+    def wants(self, event):
+        return self.types is None or event['type'] in self.types
+
+
+class EventBroker:
+    """In-process pub/sub fan-out for live dashboard events
+
+    Publishing never blocks: a subscriber that falls too far behind is marked
+    overflowed and disconnected, and can resume from its Last-Event-ID out of
+    the replay buffer. Subscribers hold no thread of their own, but a stream
+    occupies its server worker while open: run under gunicorn's gevent worker
+    (gunicorn.conf.py) so that is a greenlet rather than an OS thread. Events
+    only reach clients of the process that published them.
+    """
+
+    def __init__(self, replay_size=1000):
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self._ids = itertools.count(1)
+        self._replay = deque(maxlen=replay_size)
+
+    def publish(self, event_type, data):
+        with self._lock:
+            event = {
+                'id': next(self._ids),
+                'type': event_type,
+                'timestamp': datetime.utcnow().isoformat(),
+                'data': data
+            }
+            self._replay.append(event)
+            subscribers = list(self._subscribers)
+
+        for subscriber in subscribers:
+            if subscriber.overflowed or not subscriber.wants(event):
+                continue
+            try:
+                subscriber.queue.put_nowait(event)
+            except queue.Full:
+                subscriber.overflowed = True
+        return event
+
+    def subscribe(self, types=None, last_event_id=None):
+        """Register a subscriber, preloading events it missed since last_event_id"""
+        subscriber = Subscriber(types)
+        with self._lock:
+            if last_event_id is not None:
+                for event in self._replay:
+                    if event['id'] > last_event_id and subscriber.wants(event):
+                        try:
+                            subscriber.queue.put_nowait(event)
+                        except queue.Full:
+                            break
+            self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def subscriber_count(self):
+        with self._lock:
+            return len(self._subscribers)
+
+
+broker = EventBroker()
+
+
+def cooperative_streams():
+    """True when gevent has patched threading, so a waiting stream parks a greenlet rather than a thread
+
+    The broker's lock and the subscriber queues must also be the patched
+    kinds, which holds only if patching happened before this module loaded.
+    """
+    monkey = sys.modules.get('gevent.monkey')
+    if monkey is None or not monkey.is_module_patched('threading'):
+        return False
+    lock_type = type(threading.Lock())
+    # gevent either swaps queue.Queue for its own or leaves it on the patched lock
+    queue_patched = (monkey.is_object_patched('queue', 'Queue')
+                     or isinstance(getattr(queue.Queue(), 'mutex', None), lock_type))
+    return isinstance(broker._lock, lock_type) and queue_patched
+
+
+def format_sse(event):
+    """Render an event in text/event-stream framing"""
+    return f"id: {event['id']}\nevent: {event['type']}\ndata: {json.dumps(event)}\n\n"
+
+
+def stream_events(subscriber, heartbeat=15):
+    """Yield SSE frames for a subscriber, with keep-alive comments while idle"""
+    try:
+        yield 'retry: 3000\n\n'
+        while not subscriber.overflowed:
+            try:
+                event = subscriber.queue.get(timeout=heartbeat)
+            except queue.Empty:
+                yield ': keep-alive\n\n'
+                continue
+            yield format_sse(event)
+    finally:
+        broker.unsubscribe(subscriber)
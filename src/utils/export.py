@@ -0,0 +1,68 @@
+import csv
+import io
+import json
+import zlib
+from datetime import datetime
+from flask import Response, stream_with_context
+from sqlalchemy import select
+from src.models.user import db
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+YIELD_PER = 1000
+CHUNK_ROWS = 500
+
+
+def _csv_chunk(rows, fieldnames, header=False):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=fieldnames, extrasaction='ignore')
+    if header:
+        writer.writeheader()
+    writer.writerows(rows)
+    return buffer.getvalue()
+
+
+def _ndjson_chunk(rows):
+    return ''.join(json.dumps(row) + '\n' for row in rows)
+
+
+def iter_export(model, fmt):
+    """Yield encoded chunks of every row of model, holding one fetch batch at a time"""
+    # A transient instance gives the to_dict keys even for an empty table
+    fieldnames = list(model().to_dict())
+    if fmt == 'csv':
+        yield _csv_chunk([], fieldnames, header=True)
+
+    statement = (select(model)
+                 .options(*model.user_options())
+                 .order_by(model.id)
+                 .execution_options(yield_per=YIELD_PER))
+    chunk = []
+    for row in db.session.scalars(statement):
+        chunk.append(row.to_dict())
+        if len(chunk) >= CHUNK_ROWS:
+            yield _csv_chunk(chunk, fieldnames) if fmt == 'csv' else _ndjson_chunk(chunk)
+            chunk = []
+    if chunk:
+        yield _csv_chunk(chunk, fieldnames) if fmt == 'csv' else _ndjson_chunk(chunk)
+
+
+def _gzip(chunks):
+    compressor = zlib.compressobj(wbits=31)  # gzip container
+    for chunk in chunks:
+        if data := compressor.compress(chunk.encode()):
+            yield data
+    yield compressor.flush()
+
+
+def export_response(model, entity, fmt, use_gzip=False):
+    """Stream a full export of model as CSV or NDJSON, optionally gzipped"""
+    filename = f"{entity}-{datetime.utcnow().strftime('%Y%m%d%H%M%S')}.{fmt}"
+    headers = {'Content-Disposition': f'attachment; filename={filename}'}
+    body = iter_export(model, fmt)
+    if use_gzip:
+        body = _gzip(body)
+        headers['Content-Encoding'] = 'gzip'
+    return Response(stream_with_context(body), mimetype=EXPORT_FORMATS[fmt], headers=headers)
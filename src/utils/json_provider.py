@@ -0,0 +1,50 @@
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # pinned in requirements.txt; without it Flask's own provider stays in place
+    orjson = None
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """Flask JSON provider backed by orjson
+
+    Output matches the default provider: keys sorted when sort_keys is set,
+    and datetimes, decimals and the like still go through its default() so
+    they render exactly as before, though non-ASCII text is written as UTF-8
+    rather than \\u escapes. Responses are encoded straight to bytes. dumps()
+    and loads() calls with options orjson lacks fall back to the stdlib.
+    """
+
+    def _options(self, pretty=False, sort_keys=None):
+        options = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+        if (self.sort_keys if sort_keys is None else sort_keys):
+            options |= orjson.OPT_SORT_KEYS
+        if pretty:
+            options |= orjson.OPT_INDENT_2
+        return options
+
+    def dumps(self, obj, **kwargs):
+        indent = kwargs.pop('indent', None)
+        sort_keys = kwargs.pop('sort_keys', self.sort_keys)
+        if kwargs or indent not in (None, 2):
+            # Options orjson has no equivalent for go through the stdlib encoder
+            return super().dumps(obj, indent=indent, sort_keys=sort_keys, **kwargs)
+        return orjson.dumps(obj, default=self.default, option=self._options(indent == 2, sort_keys)).decode()
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        pretty = self.compact is False or (self.compact is None and self._app.debug)
+        body = orjson.dumps(obj, default=self.default, option=self._options(pretty))
+        return self._app.response_class(body + b'\n', mimetype=self.mimetype)
+
+
+def init_json(app):
+    """Switch the app to the fastest JSON provider installed"""
+    if orjson is not None:
+        app.json = OrjsonProvider(app)
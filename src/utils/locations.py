@@ -0,0 +1,242 @@
+from sqlalchemy import bindparam, event, func, inspect, select, update
+from sqlalchemy.orm import Session
+from src.models.user import db
+from src.models.location import Location
+from src.models.asset import Asset
+from src.models.ticket import Ticket
+from src.models.tool import Tool
+
+# Models linked into the location tree, with the Location column holding their subtree count
+LOCATED_MODELS = {
+    Asset: 'asset_count',
+    Ticket: 'ticket_count',
+    Tool: 'tool_count',
+}
+BACKFILL_BATCH_SIZE = 1000
+
+
+def split_location(text):
+    """Split 'Main Building / 1st Floor / Dev Office' into its segments"""
+    return [segment.strip() for segment in (text or '').split('/') if segment.strip()]
+
+
+def location_path(segments):
+    return '/' + ''.join(segment.lower() + '/' for segment in segments)
+
+
+def ancestor_paths(path):
+    """'/a/b/' -> ['/a/', '/a/b/']"""
+    parts = path.strip('/').split('/')
+    return ['/' + '/'.join(parts[:i]) + '/' for i in range(1, len(parts) + 1)]
+
+
+def subtree_filter(column, path):
+    """Range condition matching path and everything below it, usable by an index"""
+    # '0' is the character after '/', so this is every string starting with path
+    return (column >= path) & (column < path[:-1] + '0')
+
+
+def subtree_condition(model, args):
+    """Build a filter on model.location_id for the location_id/location_path request args
+
+    Returns None when neither arg is given and raises LookupError for an
+    unknown location_id.
+    """
+    if args.get('location_id'):
+        node = db.session.get(Location, int(args['location_id']))
+        if node is None:
+            raise LookupError('Location not found')
+        path = node.path
+    elif args.get('location_path'):
+        path = location_path(split_location(args['location_path']))
+        if path == '/':
+            return None
+    else:
+        return None
+    subtree = db.select(Location.id).where(subtree_filter(Location.path, path))
+    return model.location_id.in_(subtree)
+
+
+def get_or_create_location(session, text, cache=None):
+    """Return the Location node for a location string, adding missing ancestors"""
+    segments = split_location(text)
+    if not segments:
+        return None
+    cache = {} if cache is None else cache
+    paths = [location_path(segments[:i]) for i in range(1, len(segments) + 1)]
+
+    missing = [path for path in paths if path not in cache]
+    if missing:
+        with session.no_autoflush:
+            for node in session.query(Location).filter(Location.path.in_(missing)):
+                cache[node.path] = node
+
+    parent = None
+    for depth, (segment, path) in enumerate(zip(segments, paths)):
+        node = cache.get(path)
+        if node is None:
+            node = Location(name=segment[:100], path=path, depth=depth, parent=parent)
+            session.add(node)
+            cache[path] = node
+        parent = node
+    return parent
+
+
+def resolve_location_ids(session, texts):
+    """Map location strings to node ids, creating nodes as needed (for bulk writers)"""
+    cache = {}
+    nodes = {text: get_or_create_location(session, text, cache) for text in set(texts) if text}
+    session.flush()
+    return {text: node.id for text, node in nodes.items() if node is not None}
+
+
+def _node_path(session, location_id, cache):
+    if location_id is None:
+        return None
+    if location_id not in cache:
+        with session.no_autoflush:
+            node = session.get(Location, location_id)
+        cache[location_id] = node.path if node else None
+    return cache[location_id]
+
+
+def _previous_location_id(state):
+    history = state.attrs.location_id.history
+    if history.deleted:
+        return history.deleted[0]
+    return history.unchanged[0] if history.unchanged else None
+
+
+@event.listens_for(Session, 'before_flush')
+def _link_locations(session, flush_context, instances):
+    nodes, paths, deltas = {}, {}, {}
+
+    def shift(path, column, delta):
+        for ancestor in ancestor_paths(path) if path else ():
+            deltas[(ancestor, column)] = deltas.get((ancestor, column), 0) + delta
+
+    for obj in list(session.new) + list(session.dirty):
+        column = LOCATED_MODELS.get(type(obj))
+        if column is None or obj in session.deleted:
+            continue
+        state = inspect(obj)
+        is_new = obj in session.new
+        if not is_new and not state.attrs.location.history.has_changes():
+            continue
+        old_path = None if is_new else _node_path(session, _previous_location_id(state), paths)
+        node = get_or_create_location(session, obj.location, nodes)
+        obj.location_node = node
+        new_path = node.path if node else None
+        if old_path != new_path:
+            shift(old_path, column, -1)
+            shift(new_path, column, 1)
+
+    for obj in session.deleted:
+        column = LOCATED_MODELS.get(type(obj))
+        if column is not None:
+            shift(_node_path(session, obj.location_id, paths), column, -1)
+
+    if deltas:
+        session.info.setdefault('location_deltas', {})
+        for key, delta in deltas.items():
+            session.info['location_deltas'][key] = session.info['location_deltas'].get(key, 0) + delta
+
+
+@event.listens_for(Session, 'after_flush')
+def _write_location_counts(session, flush_context):
+    deltas = session.info.pop('location_deltas', None)
+    if not deltas:
+        return
+    table = Location.__table__
+    connection = session.connection()
+    for (path, column), delta in deltas.items():
+        if delta:
+            connection.execute(
+                update(table).where(table.c.path == path).values({column: table.c[column] + delta})
+            )
+
+
+def move_location_counts(connection, model, row_id, location_id):
+    """Shift subtree counts for one row that a Core UPDATE is about to move to location_id
+
+    Ancestors shared by the old and new node are left alone. Call it before
+    the row's UPDATE in the same transaction; if that UPDATE matches nothing,
+    roll back.
+    """
+    column = LOCATED_MODELS.get(model)
+    if column is None:
+        return
+    old_id = connection.execute(select(model.location_id).where(model.id == row_id)).scalar()
+    if old_id == location_id:
+        return
+    node_ids = [node_id for node_id in (old_id, location_id) if node_id is not None]
+    paths = dict(connection.execute(select(Location.id, Location.path).where(Location.id.in_(node_ids))).all())
+    old = set(ancestor_paths(paths[old_id])) if old_id in paths else set()
+    new = set(ancestor_paths(paths[location_id])) if location_id in paths else set()
+
+    table = Location.__table__
+    for changed, delta in ((old - new, -1), (new - old, 1)):
+        if changed:
+            connection.execute(
+                update(table).where(table.c.path.in_(changed)).values({column: table.c[column] + delta})
+            )
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _forget_location_counts(session, previous_transaction):
+    session.info.pop('location_deltas', None)
+
+
+def reconcile_location_counts():
+    """Recompute every node's subtree counts from the linked tables"""
+    table = Location.__table__
+    totals = {}
+    for model, column in LOCATED_MODELS.items():
+        rows = (db.session.query(Location.path, func.count(model.id))
+                .join(model, model.location_id == Location.id)
+                .group_by(Location.path)
+                .all())
+        for path, count in rows:
+            for ancestor in ancestor_paths(path):
+                totals.setdefault(ancestor, {}).setdefault(column, 0)
+                totals[ancestor][column] += count
+
+    connection = db.session.connection()
+    connection.execute(update(table).values(asset_count=0, ticket_count=0, tool_count=0))
+    for path, counts in totals.items():
+        connection.execute(update(table).where(table.c.path == path).values(counts))
+    db.session.commit()
+
+
+def backfill_location_ids(batch_size=BACKFILL_BATCH_SIZE):
+    """Link rows that predate the location tree to their nodes, one batch at a time
+
+    Only location_id is written; version and updated_at are kept as they
+    are since the row itself has not changed. Subtree counts are left to
+    reconcile_location_counts.
+    """
+    for model in LOCATED_MODELS:
+        table = model.__table__
+        last_id = 0
+        while True:
+            rows = db.session.execute(
+                select(table.c.id, table.c.location)
+                .where(table.c.location_id.is_(None), table.c.location.isnot(None), table.c.id > last_id)
+                .order_by(table.c.id)
+                .limit(batch_size)
+            ).all()
+            if not rows:
+                break
+            last_id = rows[-1].id
+            location_ids = resolve_location_ids(db.session, [row.location for row in rows])
+            linked = [{'b_id': row.id, 'location_id': location_ids[row.location]}
+                      for row in rows if row.location in location_ids]
+            if linked:
+                db.session.execute(
+                    update(table)
+                    .where(table.c.id == bindparam('b_id'))
+                    .values(location_id=bindparam('location_id'),
+                            version=table.c.version, updated_at=table.c.updated_at),
+                    linked
+                )
+            db.session.commit()
@@ -0,0 +1,167 @@
+import heapq
+import re
+import threading
+from datetime import date, datetime, timedelta
+from sqlalchemy.exc import IntegrityError
+from src.models.user import User, db
+from src.models.asset import Asset
+from src.models.ticket import Ticket
+from src.utils.events import broker
+from src.utils.activity import log_activities
+
+# Date columns the scheduler watches, with how their tickets are worded
+DUE_KINDS = {
+    'inspection': ('inspection_due', 'Inspection due', 'medium'),
+    'warranty': ('warranty_expiry', 'Warranty expiring', 'low'),
+}
+
+_scheduler = None
+
+
+def parse_window(value, default_days=30):
+    """Parse a window such as '30d', '2w' or '14' into a timedelta"""
+    if not value:
+        return timedelta(days=default_days)
+    match = re.fullmatch(r'(\d+)\s*([dw]?)', value.strip().lower())
+    if not match:
+        raise ValueError("within must look like '30d' or '2w'")
+    amount, unit = int(match.group(1)), match.group(2) or 'd'
+    return timedelta(weeks=amount) if unit == 'w' else timedelta(days=amount)
+
+
+def due_assets(start, end, kinds=DUE_KINDS):
+    """Return (due_date, kind, asset) for dates in [start, end], earliest first
+
+    Each kind is one range scan on its indexed date column; the sorted
+    results are merged rather than re-sorted.
+    """
+    streams = []
+    for kind in kinds:
+        column = getattr(Asset, DUE_KINDS[kind][0])
+        assets = (Asset.with_users()
+                  .filter(column >= start, column <= end)
+                  .order_by(column, Asset.id)
+                  .all())
+        streams.append([(getattr(asset, DUE_KINDS[kind][0]), kind, asset) for asset in assets])
+    return list(heapq.merge(*streams, key=lambda item: (item[0], item[2].id)))
+
+
+def _dedupe_key(kind, asset_id, due_date):
+    return f'{kind}:asset:{asset_id}:{due_date.isoformat()}'
+
+
+class MaintenanceScheduler:
+    """Priority queue of upcoming asset due dates that raises maintenance tickets
+
+    refresh() loads due dates in the look-ahead window with indexed range
+    scans; run_pending() pops everything whose lead time has been reached and
+    raises one ticket per (kind, asset, due date). The dedupe key is unique in
+    the database, so concurrent schedulers cannot raise the same ticket twice.
+    """
+
+    def __init__(self, lead_days=7, lookback_days=90, horizon_days=30):
+        self.lead = timedelta(days=lead_days)
+        self.lookback = timedelta(days=lookback_days)
+        self.horizon = timedelta(days=horizon_days)
+        self._heap = []
+
+    def refresh(self, today):
+        self._heap = [
+            (due_date - self.lead, due_date, kind, asset.id)
+            for due_date, kind, asset in due_assets(today - self.lookback, today + self.lead + self.horizon)
+        ]
+        heapq.heapify(self._heap)
+
+    def next_fire_date(self):
+        return self._heap[0][0] if self._heap else None
+
+    def run_pending(self, today):
+        """Raise tickets for every queued item that has come due, returning them"""
+        due = []
+        while self._heap and self._heap[0][0] <= today:
+            due.append(heapq.heappop(self._heap))
+        if not due:
+            return []
+
+        keys = {_dedupe_key(kind, asset_id, due_date): (due_date, kind, asset_id)
+                for _, due_date, kind, asset_id in due}
+        raised = {key for (key,) in db.session.query(Ticket.dedupe_key).filter(Ticket.dedupe_key.in_(list(keys)))}
+        pending = {key: item for key, item in keys.items() if key not in raised}
+        if not pending:
+            return []
+
+        creator = (User.query.filter_by(role='admin').order_by(User.id).first()
+                   or User.query.order_by(User.id).first())
+        if creator is None:
+            return []
+
+        assets = {asset.id: asset for asset in Asset.query.filter(
+            Asset.id.in_({asset_id for _, _, asset_id in pending.values()})).all()}
+        tickets = []
+        for key, (due_date, kind, asset_id) in pending.items():
+            asset = assets.get(asset_id)
+            if asset is None or getattr(asset, DUE_KINDS[kind][0]) != due_date:
+                continue  # asset deleted or rescheduled since the queue was loaded
+            _, label, priority = DUE_KINDS[kind]
+            ticket = Ticket(
+                title=f'{label}: {asset.name} ({asset.asset_tag})',
+                description=f'{label} on {due_date.isoformat()} for asset {asset.asset_tag}',
+                priority='high' if due_date <= today else priority,
+                status='open',
+                category='Preventive Maintenance',
+                created_by=creator.id,
+                location=asset.location,
+                dedupe_key=key
+            )
+            try:
+                with db.session.begin_nested():
+                    db.session.add(ticket)
+            except IntegrityError:
+                continue  # another worker raised it first
+            tickets.append(ticket)
+
+        log_activities([
+            {'activity_type': 'ticket_created', 'entity': 'ticket', 'entity_id': ticket.id,
+             'description': f'New ticket created: {ticket.title}', 'user_id': ticket.created_by}
+            for ticket in tickets
+        ])
+        db.session.commit()
+        for ticket in tickets:
+            broker.publish('ticket_created', ticket.to_dict())
+        return tickets
+
+
+def start_maintenance_scheduler(app, interval):
+    """Run the maintenance scheduler on a daemon thread, reloading its queue every interval seconds"""
+    global _scheduler
+    if _scheduler is not None or not interval:
+        return
+
+    scheduler = MaintenanceScheduler(
+        lead_days=app.config.get('MAINTENANCE_LEAD_DAYS', 7),
+        lookback_days=app.config.get('MAINTENANCE_LOOKBACK_DAYS', 90)
+    )
+    stopped = threading.Event()
+
+    def run():
+        while True:
+            with app.app_context():
+                try:
+                    today = date.today()
+                    scheduler.refresh(today)
+                    scheduler.run_pending(today)
+                except Exception as e:
+                    db.session.rollback()
+                    app.logger.warning('Maintenance scheduler run failed: %s', e)
+                next_fire = scheduler.next_fire_date()
+
+            # Sleep until the next queued item comes due or the next reload
+            wait = interval
+            if next_fire is not None:
+                until = datetime.combine(next_fire, datetime.min.time()) - datetime.now()
+                wait = max(1, min(interval, until.total_seconds()))
+            if stopped.wait(wait):
+                return
+
+    _scheduler = threading.Thread(target=run, name='maintenance-scheduler', daemon=True)
+    _scheduler.start()
@@ -0,0 +1,123 @@
+import heapq
+import threading
+from datetime import datetime, timedelta
+from sqlalchemy import update
+from src.models.user import db
+from src.models.tool import Tool
+from src.utils.changes import record_changes
+from src.utils.events import broker
+from src.utils.activity import log_activities
+
+
+class OverdueSweeper:
+    """Min-heap of checkout deadlines, woken exactly when the earliest one passes
+
+    Entries are never removed on checkin; a fired entry only marks the tool
+    if it is still checked out with that same deadline, which also makes
+    marking idempotent across worker processes. The heap is reloaded from the
+    database every reload_interval seconds to pick up checkouts made by other
+    processes.
+    """
+
+    def __init__(self):
+        self._heap = []
+        self._condition = threading.Condition()
+        self._thread = None
+
+    def schedule(self, tool_id, expected_return_at):
+        if expected_return_at is None:
+            return
+        with self._condition:
+            heapq.heappush(self._heap, (expected_return_at, tool_id))
+            if self._heap[0] == (expected_return_at, tool_id):
+                self._condition.notify()
+
+    def load(self):
+        """Replace the heap with every outstanding checkout deadline"""
+        rows = (db.session.query(Tool.expected_return_at, Tool.id)
+                .filter(Tool.status == 'in_use',
+                        Tool.expected_return_at.isnot(None),
+                        Tool.overdue_since.is_(None))
+                .all())
+        with self._condition:
+            self._heap = [tuple(row) for row in rows]
+            heapq.heapify(self._heap)
+            self._condition.notify()
+
+    def pop_due(self, now):
+        due = []
+        with self._condition:
+            while self._heap and self._heap[0][0] <= now:
+                due.append(heapq.heappop(self._heap))
+        return due
+
+    def next_deadline(self):
+        with self._condition:
+            return self._heap[0][0] if self._heap else None
+
+    def mark_overdue(self, due, now):
+        """Flag tools whose deadline passed, returning the ones this call marked"""
+        marked = []
+        for expected_return_at, tool_id in due:
+            result = db.session.execute(
+                update(Tool)
+                .where(Tool.id == tool_id,
+                       Tool.status == 'in_use',
+                       Tool.expected_return_at == expected_return_at,
+                       Tool.overdue_since.is_(None))
+                .values(overdue_since=now),
+                execution_options={'synchronize_session': False}
+            )
+            if result.rowcount:
+                marked.append(tool_id)
+        if marked:
+            record_changes(db.session.connection(), 'tool', marked, 'update')
+            log_activities([
+                {'activity_type': 'tool_overdue', 'entity': 'tool', 'entity_id': tool_id,
+                 'description': f'Tool overdue: {tool_name}', 'user_id': user_id, 'created_at': now}
+                for tool_id, tool_name, user_id in db.session.query(Tool.id, Tool.tool_name, Tool.checked_out_to)
+                .filter(Tool.id.in_(marked)).all()
+            ])
+        db.session.commit()
+
+        if marked:
+            for tool in Tool.with_users().filter(Tool.id.in_(marked)).all():
+                broker.publish('tool_overdue', tool.to_dict())
+        return marked
+
+    def start(self, app, reload_interval):
+        """Run the sweep loop on a daemon thread"""
+        if self._thread is not None:
+            return
+
+        def run():
+            reload_at = None
+            while True:
+                now = datetime.utcnow()
+                with app.app_context():
+                    try:
+                        if reload_at is None or now >= reload_at:
+                            self.load()
+                            reload_at = now + timedelta(seconds=reload_interval)
+                        due = self.pop_due(now)
+                        if due:
+                            self.mark_overdue(due, now)
+                    except Exception as e:
+                        db.session.rollback()
+                        app.logger.warning('Overdue tool sweep failed: %s', e)
+                        # A failed load is retried after the reload interval
+                        if reload_at is None or now >= reload_at:
+                            reload_at = now + timedelta(seconds=reload_interval)
+
+                # Sleep until the earliest deadline or the next reload;
+                # schedule() wakes us early for a sooner deadline
+                with self._condition:
+                    wake_at = min(filter(None, [self.next_deadline(), reload_at]),
+                                  default=datetime.utcnow() + timedelta(seconds=reload_interval))
+                    self._condition.wait(max(0.0, (wake_at - datetime.utcnow()).total_seconds()))
+
+        self._thread = threading.Thread(target=run, name='overdue-tool-sweeper', daemon=True)
+        self._thread.start()
+
+
+sweeper = OverdueSweeper()
@@ -0,0 +1,76 @@
+import base64
+import json
+from datetime import datetime
+from sqlalchemy import and_, or_
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+def encode_cursor(created_at, row_id):
+    """Encode a (created_at, id) position as an opaque cursor token"""
+    payload = json.dumps([created_at.isoformat() if created_at else None, row_id])
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Decode a cursor token back into its (created_at, id) position"""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return (datetime.fromisoformat(created_at) if created_at else None), int(row_id)
+    except (ValueError, TypeError) as e:
+        raise ValueError('Invalid pagination cursor') from e
+
+
+def get_limit(args, default=DEFAULT_PAGE_SIZE):
+    """Read the page size from the request args, clamped to MAX_PAGE_SIZE"""
+    try:
+        limit = int(args.get('limit', default))
+    except ValueError as e:
+        raise ValueError('limit must be an integer') from e
+    if limit < 1:
+        raise ValueError('limit must be at least 1')
+    return min(limit, MAX_PAGE_SIZE)
+
+
+def get_page_args(args, default_limit=DEFAULT_PAGE_SIZE):
+    """Read limit and after from the request args, raising ValueError on bad input"""
+    limit = get_limit(args, default_limit)
+    after = args.get('after')
+    return limit, decode_cursor(after) if after else None
+
+
+def paginate(query, model, limit, after=None):
+    """Return one page of query ordered newest first, keyed on (created_at, id)
+
+    The caller gets back the rows and the cursor for the next page, or None
+    when the last page has been reached.
+    """
+    if after is not None:
+        created_at, row_id = after
+        if created_at is None:
+            query = query.filter(model.created_at.is_(None), model.id < row_id)
+        else:
+            query = query.filter(or_(
+                model.created_at < created_at,
+                and_(model.created_at == created_at, model.id < row_id),
+                model.created_at.is_(None)
+            ))
+
+    rows = query.order_by(model.created_at.desc(), model.id.desc()).limit(limit + 1).all()
+    if len(rows) <= limit:
+        return rows, None
+
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_cursor(last.created_at, last.id)
+
+
+def page_meta(limit, next_cursor):
+    """Build the pagination block returned alongside a page of results"""
+    return {
+        'limit': limit,
+        'next_cursor': next_cursor,
+        'has_more': next_cursor is not None
+    }
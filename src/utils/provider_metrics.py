@@ -0,0 +1,159 @@
+import re
+from datetime import datetime, timedelta
+from sqlalchemy import bindparam, case, insert, select, update
+from src.models.service_provider import MetricRollup, MetricSample, ProviderMetric, db
+
+NUMERIC_METRIC_TYPES = ('number', 'percentage', 'currency')
+# Finest first, with the rough length of one bucket
+ROLLUP_RESOLUTIONS = {
+    'hour': timedelta(hours=1),
+    'day': timedelta(days=1),
+    'month': timedelta(days=30),
+}
+# Automatic resolution picks the coarsest rollup that still yields this many points
+MIN_SERIES_POINTS = 12
+MAX_SERIES_POINTS = 5000
+
+
+def truncate(moment, resolution):
+    """Start of the hour, day or month bucket holding moment"""
+    if resolution == 'hour':
+        return moment.replace(minute=0, second=0, microsecond=0)
+    if resolution == 'day':
+        return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+    return moment.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def parse_metric_value(value):
+    """Read the number out of a value such as 97.3, '97.3%', '1,200' or 'R 350.00'"""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    match = re.search(r'-?\d[\d,]*(?:\.\d+)?', str(value or ''))
+    if not match:
+        raise ValueError(f'{value!r} is not a number')
+    return float(match.group().replace(',', ''))
+
+
+def format_metric_value(value, metric_type):
+    """Render a numeric value the way metric_value has always been displayed"""
+    if metric_type == 'currency':
+        return f'{value:,.2f}'
+    text = f'{value:.4f}'.rstrip('0').rstrip('.')
+    return f'{text}%' if metric_type == 'percentage' else text
+
+
+def record_samples(metric, samples):
+    """Append (recorded_at, value) samples to a numeric metric
+
+    The samples are folded into the hour, day and month rollups and the
+    metric's cached current value moves forward if they are newer. Everything
+    runs on the session's transaction; the caller commits.
+    """
+    if metric.metric_type not in NUMERIC_METRIC_TYPES:
+        raise ValueError(f"Only {', '.join(NUMERIC_METRIC_TYPES)} metrics take samples")
+    if not samples:
+        return
+    samples = sorted(samples)
+    if len({recorded_at for recorded_at, _ in samples}) != len(samples):
+        raise ValueError('Samples must have distinct recorded_at times')
+
+    connection = db.session.connection()
+    connection.execute(insert(MetricSample.__table__), [
+        {'metric_id': metric.id, 'recorded_at': recorded_at, 'value': value}
+        for recorded_at, value in samples
+    ])
+
+    table = MetricRollup.__table__
+    for resolution in ROLLUP_RESOLUTIONS:
+        buckets = {}
+        for recorded_at, value in samples:
+            key = truncate(recorded_at, resolution)
+            count, total, low, high = buckets.get(key, (0, 0.0, value, value))
+            buckets[key] = (count + 1, total + value, min(low, value), max(high, value))
+
+        existing = set(connection.execute(
+            select(table.c.bucket_start).where(table.c.metric_id == metric.id,
+                                               table.c.resolution == resolution,
+                                               table.c.bucket_start.in_(list(buckets)))
+        ).scalars())
+        rows = [
+            {'b_start': bucket_start, 'b_count': count, 'b_total': total, 'b_low': low, 'b_high': high}
+            for bucket_start, (count, total, low, high) in buckets.items()
+        ]
+        updates = [row for row in rows if row['b_start'] in existing]
+        inserts = [row for row in rows if row['b_start'] not in existing]
+        if updates:
+            connection.execute(
+                update(table)
+                .where(table.c.metric_id == metric.id, table.c.resolution == resolution,
+                       table.c.bucket_start == bindparam('b_start'))
+                .values(sample_count=table.c.sample_count + bindparam('b_count'),
+                        total=table.c.total + bindparam('b_total'),
+                        minimum=case((table.c.minimum <= bindparam('b_low'), table.c.minimum), else_=bindparam('b_low')),
+                        maximum=case((table.c.maximum >= bindparam('b_high'), table.c.maximum), else_=bindparam('b_high'))),
+                updates
+            )
+        if inserts:
+            connection.execute(insert(table), [
+                {'metric_id': metric.id, 'resolution': resolution, 'bucket_start': row['b_start'],
+                 'sample_count': row['b_count'], 'total': row['b_total'],
+                 'minimum': row['b_low'], 'maximum': row['b_high']}
+                for row in inserts
+            ])
+
+    latest_at, latest_value = samples[-1]
+    if metric.recorded_at is None or latest_at >= metric.recorded_at:
+        metric.current_value = latest_value
+        metric.recorded_at = latest_at
+        metric.metric_value = format_metric_value(latest_value, metric.metric_type)
+
+
+def pick_resolution(start, end):
+    """The coarsest rollup that still gives MIN_SERIES_POINTS over [start, end), else raw"""
+    for resolution, length in reversed(ROLLUP_RESOLUTIONS.items()):
+        if (end - start) / length >= MIN_SERIES_POINTS:
+            return resolution
+    return 'raw'
+
+
+def metric_series(metric, start, end, resolution='auto'):
+    """Return (resolution, points) for a metric over [start, end)
+
+    Rollup points cover whole buckets, so the first one may start before
+    start. At most MAX_SERIES_POINTS points are returned.
+    """
+    if resolution == 'auto':
+        resolution = pick_resolution(start, end)
+    if resolution == 'raw':
+        rows = (MetricSample.query
+                .filter(MetricSample.metric_id == metric.id,
+                        MetricSample.recorded_at >= start,
+                        MetricSample.recorded_at < end)
+                .order_by(MetricSample.recorded_at)
+                .limit(MAX_SERIES_POINTS)
+                .all())
+    elif resolution in ROLLUP_RESOLUTIONS:
+        rows = (MetricRollup.query
+                .filter(MetricRollup.metric_id == metric.id,
+                        MetricRollup.resolution == resolution,
+                        MetricRollup.bucket_start >= truncate(start, resolution),
+                        MetricRollup.bucket_start < end)
+                .order_by(MetricRollup.bucket_start)
+                .limit(MAX_SERIES_POINTS)
+                .all())
+    else:
+        raise ValueError(f"resolution must be auto, raw or one of {', '.join(ROLLUP_RESOLUTIONS)}")
+    return resolution, [row.to_dict() for row in rows]
+
+
+def backfill_metric_samples():
+    """Seed the time series of numeric metrics that predate it from their stored value"""
+    metrics = ProviderMetric.query.filter(ProviderMetric.metric_type.in_(NUMERIC_METRIC_TYPES),
+                                          ProviderMetric.current_value.is_(None)).all()
+    for metric in metrics:
+        try:
+            value = parse_metric_value(metric.metric_value)
+        except ValueError:
+            continue
+        record_samples(metric, [(metric.updated_at or datetime.utcnow(), value)])
+    db.session.commit()
@@ -0,0 +1,176 @@
+import calendar
+from datetime import MAXYEAR, date, datetime, time, timedelta
+
+FREQUENCIES = ('DAILY', 'WEEKLY', 'MONTHLY', 'YEARLY')
+WEEKDAYS = ('MO', 'TU', 'WE', 'TH', 'FR', 'SA', 'SU')
+MAX_COUNT = 1000
+# Give up on a rule after this many periods in a row produce no dates (e.g. FREQ=YEARLY on Feb 30)
+MAX_EMPTY_PERIODS = 100
+# Days covering at least one period of each frequency
+PERIOD_DAYS = {'DAILY': 1, 'WEEKLY': 7, 'MONTHLY': 31, 'YEARLY': 366}
+
+
+def _parse_until(value):
+    for fmt in ('%Y%m%dT%H%M%S', '%Y%m%d'):
+        try:
+            until = datetime.strptime(value.rstrip('Z'), fmt)
+        except ValueError:
+            continue
+        # A bare date includes the whole day
+        return until if 'T' in value else datetime.combine(until.date(), time.max)
+    raise ValueError(f'UNTIL must look like 20261231 or 20261231T170000, not {value!r}')
+
+
+def parse_rule(text):
+    """Parse the RRULE subset this app supports into a dict
+
+    Supports FREQ (DAILY, WEEKLY, MONTHLY, YEARLY), INTERVAL, BYDAY with
+    weekly rules, BYMONTHDAY with monthly rules, and COUNT or UNTIL.
+    Raises ValueError on anything else.
+    """
+    rule = {'freq': None, 'interval': 1, 'byday': None, 'bymonthday': None, 'count': None, 'until': None}
+    text = (text or '').strip()
+    if text.upper().startswith('RRULE:'):
+        text = text[len('RRULE:'):]
+
+    for part in filter(None, text.split(';')):
+        key, _, value = part.partition('=')
+        key, value = key.strip().upper(), value.strip().upper()
+        if not value:
+            raise ValueError(f'Malformed recurrence part {part!r}')
+        if key == 'FREQ':
+            if value not in FREQUENCIES:
+                raise ValueError(f"FREQ must be one of {', '.join(FREQUENCIES)}")
+            rule['freq'] = value
+        elif key == 'INTERVAL':
+            rule['interval'] = int(value)
+            if rule['interval'] < 1:
+                raise ValueError('INTERVAL must be at least 1')
+        elif key == 'BYDAY':
+            days = value.split(',')
+            if any(day not in WEEKDAYS for day in days):
+                raise ValueError(f"BYDAY days must be among {', '.join(WEEKDAYS)}")
+            rule['byday'] = sorted({WEEKDAYS.index(day) for day in days})
+        elif key == 'BYMONTHDAY':
+            days = [int(day) for day in value.split(',')]
+            if any(not 1 <= abs(day) <= 31 for day in days):
+                raise ValueError('BYMONTHDAY days must be between 1 and 31, or -31 and -1')
+            rule['bymonthday'] = days
+        elif key == 'COUNT':
+            rule['count'] = int(value)
+            if not 1 <= rule['count'] <= MAX_COUNT:
+                raise ValueError(f'COUNT must be between 1 and {MAX_COUNT}')
+        elif key == 'UNTIL':
+            rule['until'] = _parse_until(value)
+        else:
+            raise ValueError(f'Unsupported recurrence part {key}')
+
+    if rule['freq'] is None:
+        raise ValueError('FREQ is required')
+    if rule['byday'] and rule['freq'] != 'WEEKLY':
+        raise ValueError('BYDAY is only supported with FREQ=WEEKLY')
+    if rule['bymonthday'] and rule['freq'] != 'MONTHLY':
+        raise ValueError('BYMONTHDAY is only supported with FREQ=MONTHLY')
+    if rule['count'] and rule['until']:
+        raise ValueError('COUNT and UNTIL cannot be combined')
+    return rule
+
+
+def _month_dates(year, month, days, at):
+    last = calendar.monthrange(year, month)[1]
+    resolved = sorted({day if day > 0 else last + day + 1 for day in days})
+    return [datetime.combine(date(year, month, day), at) for day in resolved if 1 <= day <= last]
+
+
+def _periods(rule, first_start, after):
+    """Yield each period's candidate starts, beginning at the period holding after
+
+    Periods are fixed-length, so the first one needed is computed directly
+    instead of stepping over every earlier period.
+    """
+    freq, interval = rule['freq'], rule['interval']
+    behind = after is not None and after > first_start
+
+    if freq == 'DAILY':
+        step = timedelta(days=interval)
+        period = (after - first_start) // step if behind else 0
+        while True:
+            yield [first_start + period * step]
+            period += 1
+
+    elif freq == 'WEEKLY':
+        week = first_start - timedelta(days=first_start.weekday())
+        step = timedelta(weeks=interval)
+        days = rule['byday'] or [first_start.weekday()]
+        period = (after - week) // step if behind else 0
+        while True:
+            base = week + period * step
+            yield [base + timedelta(days=day) for day in days]
+            period += 1
+
+    else:
+        months = interval * (12 if freq == 'YEARLY' else 1)
+        first_month = first_start.year * 12 + first_start.month - 1
+        days = rule['bymonthday'] or [first_start.day]
+        period = (after.year * 12 + after.month - 1 - first_month) // months if behind else 0
+        while True:
+            year, month = divmod(first_month + period * months, 12)
+            if year > MAXYEAR:
+                return
+            yield _month_dates(year, month + 1, days, first_start.time())
+            period += 1
+
+
+def iter_starts(rule, first_start, after=None):
+    """Yield the series' occurrence starts in order, from after onwards when given
+
+    The generator is unbounded for open-ended rules; callers stop reading
+    once they pass the end of the window they need. COUNT rules are walked
+    from the first occurrence since the count has to be kept.
+    """
+    emitted = empty = 0
+    periods = _periods(rule, first_start, None if rule['count'] else after)
+    while True:
+        try:
+            starts = next(periods, None)
+        except OverflowError:
+            return  # a daily or weekly step ran past year 9999
+        if starts is None:
+            return
+        starts = [start for start in starts if start >= first_start]
+        empty = 0 if starts else empty + 1
+        if empty > MAX_EMPTY_PERIODS:
+            return
+        for start in starts:
+            if rule['until'] and start > rule['until']:
+                return
+            emitted += 1
+            if rule['count'] and emitted > rule['count']:
+                return
+            if after is None or start >= after:
+                yield start
+
+
+def last_start(rule, first_start):
+    """The latest occurrence start of a bounded rule, or None when it never ends
+
+    For UNTIL rules that is the last start the rule generates on or before
+    UNTIL (None if there is none), found by reading back from UNTIL in
+    widening windows rather than walking every occurrence from the first.
+    """
+    if rule['until']:
+        span = PERIOD_DAYS[rule['freq']] * rule['interval']
+        while True:
+            after = rule['until'] - timedelta(days=span)
+            final = None
+            for final in iter_starts(rule, first_start, after if after > first_start else None):
+                pass
+            if final is not None or after <= first_start:
+                return final
+            span *= 2
+    if rule['count']:
+        final = first_start
+        for final in iter_starts(rule, first_start):
+            pass
+        return final
+    return None
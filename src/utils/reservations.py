@@ -0,0 +1,102 @@
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from src.models.user import db
+from src.models.tool import ToolReservation
+
+
+class ToolSchedule:
+    """Active bookings of one tool, kept sorted by start time
+
+    A tool's active bookings never overlap (inserts are conflict-checked), so
+    ordering by start also orders by end. That makes the ordered list a valid
+    interval index: an overlap query is one bisect on the end times followed
+    by a walk over the hits.
+    """
+
+    def __init__(self, bookings=()):
+        self.bookings = sorted(bookings)  # (starts_at, ends_at, reservation_id)
+        self.ends = [ends_at for _, ends_at, _ in self.bookings]
+        self.loaded_at = time.monotonic()
+
+    def overlapping(self, start, end):
+        """Bookings intersecting [start, end)"""
+        hits = []
+        for index in range(bisect_right(self.ends, start), len(self.bookings)):
+            booking = self.bookings[index]
+            if booking[0] >= end:
+                break
+            hits.append(booking)
+        return hits
+
+    def is_free(self, start, end):
+        index = bisect_right(self.ends, start)
+        return index == len(self.bookings) or self.bookings[index][0] >= end
+
+    def add(self, starts_at, ends_at, reservation_id):
+        booking = (starts_at, ends_at, reservation_id)
+        index = bisect_left(self.bookings, booking)
+        self.bookings.insert(index, booking)
+        self.ends.insert(index, ends_at)
+
+    def remove(self, reservation_id):
+        for index, booking in enumerate(self.bookings):
+            if booking[2] == reservation_id:
+                del self.bookings[index]
+                del self.ends[index]
+                return
+
+
+class ReservationCalendar:
+    """Per-tool schedules loaded on first use and updated in place on writes
+
+    The ttl bounds staleness from bookings made by other worker processes;
+    the database overlap check on insert stays authoritative.
+    """
+
+    def __init__(self, ttl=60):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._schedules = {}
+
+    def _load(self, tool_ids):
+        rows = (db.session.query(ToolReservation.tool_id, ToolReservation.starts_at,
+                                 ToolReservation.ends_at, ToolReservation.id)
+                .filter(ToolReservation.tool_id.in_(tool_ids), ToolReservation.status == 'active')
+                .all())
+        bookings = {tool_id: [] for tool_id in tool_ids}
+        for tool_id, starts_at, ends_at, reservation_id in rows:
+            bookings[tool_id].append((starts_at, ends_at, reservation_id))
+        return {tool_id: ToolSchedule(items) for tool_id, items in bookings.items()}
+
+    def schedules(self, tool_ids):
+        """Return {tool_id: ToolSchedule}, loading missing or expired ones in one query"""
+        now = time.monotonic()
+        with self._lock:
+            found = {tool_id: self._schedules.get(tool_id) for tool_id in tool_ids}
+        stale = [tool_id for tool_id, schedule in found.items()
+                 if schedule is None or now - schedule.loaded_at > self.ttl]
+        for start in range(0, len(stale), 500):
+            loaded = self._load(stale[start:start + 500])
+            with self._lock:
+                self._schedules.update(loaded)
+            found.update(loaded)
+        return found
+
+    def schedule(self, tool_id):
+        return self.schedules([tool_id])[tool_id]
+
+    def add(self, reservation):
+        with self._lock:
+            schedule = self._schedules.get(reservation.tool_id)
+            if schedule is not None:
+                schedule.add(reservation.starts_at, reservation.ends_at, reservation.id)
+
+    def remove(self, reservation):
+        with self._lock:
+            schedule = self._schedules.get(reservation.tool_id)
+            if schedule is not None:
+                schedule.remove(reservation.id)
+
+
+calendar = ReservationCalendar()
@@ -0,0 +1,41 @@
+from sqlalchemy import inspect, text
+from sqlalchemy.schema import CreateIndex
+
+
+def upgrade_schema(engine, metadata):
+    """Add columns and indexes that models gained after their table was created
+
+    create_all only creates missing tables, so existing databases would
+    otherwise never pick up new columns or indexes. Only additive changes are
+    made; new columns must be nullable or carry a server default.
+    """
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    preparer = engine.dialect.identifier_preparer
+
+    with engine.begin() as connection:
+        for table in metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+
+            present = {column['name'] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in present:
+                    continue
+                column_type = column.type.compile(dialect=engine.dialect)
+                ddl = f'ALTER TABLE {preparer.format_table(table)} ADD {preparer.format_column(column)} {column_type}'
+                if column.server_default is not None:
+                    default = column.server_default.arg
+                    if isinstance(default, str):
+                        default = "'" + default.replace("'", "''") + "'"
+                    else:
+                        default = default.compile(dialect=engine.dialect)
+                    ddl += f' DEFAULT {default}'
+                    if not column.nullable:
+                        ddl += ' NOT NULL'
+                connection.execute(text(ddl))
+
+            indexes = {index['name'] for index in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in indexes:
+                    connection.execute(CreateIndex(index))
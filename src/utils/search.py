@@ -0,0 +1,77 @@
+from sqlalchemy import or_, text
+from src.models.ticket import Ticket
+
+SEARCH_COLUMNS = ('title', 'description', 'location', 'category')
+
+# External-content FTS5 index over the ticket table. The triggers keep it in
+# step with every insert, delete and edit of an indexed column, whether the
+# write comes from the ORM or from a bulk statement.
+_FTS_DDL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS ticket_fts USING fts5(
+        title, description, location, category,
+        content='ticket', content_rowid='id'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS ticket_fts_ai AFTER INSERT ON ticket BEGIN
+        INSERT INTO ticket_fts(rowid, title, description, location, category)
+        VALUES (new.id, new.title, new.description, new.location, new.category);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS ticket_fts_ad AFTER DELETE ON ticket BEGIN
+        INSERT INTO ticket_fts(ticket_fts, rowid, title, description, location, category)
+        VALUES ('delete', old.id, old.title, old.description, old.location, old.category);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS ticket_fts_au AFTER UPDATE OF title, description, location, category ON ticket BEGIN
+        INSERT INTO ticket_fts(ticket_fts, rowid, title, description, location, category)
+        VALUES ('delete', old.id, old.title, old.description, old.location, old.category);
+        INSERT INTO ticket_fts(rowid, title, description, location, category)
+        VALUES (new.id, new.title, new.description, new.location, new.category);
+    END""",
+]
+
+
+def fts_supported(engine):
+    return engine.dialect.name == 'sqlite'
+
+
+def install_ticket_search(engine):
+    """Create the ticket FTS index and its triggers, backfilling on first install"""
+    if not fts_supported(engine):
+        return False
+
+    with engine.begin() as connection:
+        exists = connection.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'ticket_fts'")
+        ).first()
+        for statement in _FTS_DDL:
+            connection.execute(text(statement))
+        if not exists:
+            connection.execute(text("INSERT INTO ticket_fts(ticket_fts) VALUES ('rebuild')"))
+    return True
+
+
+def build_match_query(q):
+    """Turn free text into an FTS5 query that ANDs each term as a prefix match"""
+    terms = [term.replace('"', '""') for term in q.split()]
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+def search_ticket_ids(session, q, limit, offset=0):
+    """Return up to limit + 1 ticket ids matching q, best match first"""
+    match = build_match_query(q)
+    if not match:
+        return []
+
+    if fts_supported(session.get_bind()):
+        rows = session.execute(
+            text("SELECT rowid FROM ticket_fts WHERE ticket_fts MATCH :match "
+                 "ORDER BY bm25(ticket_fts) LIMIT :limit OFFSET :offset"),
+            {'match': match, 'limit': limit + 1, 'offset': offset}
+        )
+        return [row[0] for row in rows]
+
+    # Other databases fall back to a LIKE scan, newest first
+    query = session.query(Ticket.id)
+    for term in q.split():
+        pattern = f'%{term}%'
+        query = query.filter(or_(*[getattr(Ticket, column).ilike(pattern) for column in SEARCH_COLUMNS]))
+    rows = query.order_by(Ticket.created_at.desc(), Ticket.id.desc()).limit(limit + 1).offset(offset)
+    return [row[0] for row in rows]
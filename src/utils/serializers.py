@@ -0,0 +1,94 @@
+from functools import cached_property
+from sqlalchemy import Date, DateTime
+from sqlalchemy.orm import aliased
+from src.models.user import User, db
+from src.models.ticket import Ticket
+from src.models.asset import Asset
+from src.models.tool import Tool
+
+LAYOUTS = ('rows', 'columnar')
+
+
+class RowSerializer:
+    """Serializes a model's list responses straight from result rows
+
+    The keys come from the model's own to_dict, read off a blank instance
+    the first time the serializer is used: keys naming a table column are
+    selected by name, the user names listed in user_names through an aliased
+    outer join, and the positions needing isoformat() are worked out up front. Rows come back as
+    tuples, so no ORM objects are built and the output matches to_dict.
+    """
+
+    def __init__(self, model, user_names=None):
+        self.model = model
+        self.user_names = user_names or {}
+
+    @cached_property
+    def _compiled(self):
+        # Deferred to first use, when every model is imported and the mappers can configure
+        model, user_names = self.model, self.user_names
+        keys = list(model().to_dict())
+        unknown = [key for key in keys if key not in model.__table__.c and key not in user_names]
+        if unknown:
+            raise TypeError(f"{model.__name__}.to_dict key(s) {', '.join(unknown)} have no column to select")
+        columns, joins, dates = [], [], []
+        for index, key in enumerate(keys):
+            if key in user_names:
+                user = aliased(User)
+                columns.append(user.username.label(key))
+                joins.append((user, user.id == user_names[key]))
+                continue
+            column = getattr(model, key)
+            columns.append(column.label(key))
+            if isinstance(column.type, (Date, DateTime)):
+                dates.append(index)
+        return keys, columns, joins, dates
+
+    @property
+    def keys(self):
+        return self._compiled[0]
+
+    def query(self):
+        """A query for the serialized columns; filter and paginate it like the model's own"""
+        _, columns, joins, _ = self._compiled
+        query = db.session.query(*columns).select_from(self.model)
+        for target, condition in joins:
+            query = query.outerjoin(target, condition)
+        return query
+
+    def _values(self, row):
+        values = list(row)
+        for index in self._compiled[3]:
+            if values[index] is not None:
+                values[index] = values[index].isoformat()
+        return values
+
+    def rows(self, rows):
+        """One dict per row, as to_dict would build it"""
+        keys = self.keys
+        return [dict(zip(keys, self._values(row))) for row in rows]
+
+    def columnar(self, rows):
+        """One array per key instead of one dict per row"""
+        values = [self._values(row) for row in rows]
+        return {key: [row[index] for row in values] for index, key in enumerate(self.keys)}
+
+    def serialize(self, rows, layout='rows'):
+        return self.columnar(rows) if layout == 'columnar' else self.rows(rows)
+
+
+def get_layout(args):
+    """Read the response layout from the request args, raising ValueError on bad input"""
+    layout = args.get('layout', 'rows')
+    if layout not in LAYOUTS:
+        raise ValueError(f"layout must be one of {', '.join(LAYOUTS)}")
+    return layout
+
+
+ticket_serializer = RowSerializer(
+    Ticket, user_names={'assignee_name': Ticket.assigned_to, 'creator_name': Ticket.created_by},
+)
+
+asset_serializer = RowSerializer(Asset, user_names={'assignee_name': Asset.assigned_to})
+
+tool_serializer = RowSerializer(Tool, user_names={'checked_out_user_name': Tool.checked_out_to})
@@ -0,0 +1,328 @@
+import re
+from bisect import bisect_right
+from datetime import datetime, timedelta
+from sqlalchemy import and_, bindparam, or_, update
+from src.models.service_provider import ScheduleException, ServiceSchedule, db
+from src.utils.recurrence import iter_starts, parse_rule
+
+# Schedules in these states occupy one of the provider's job slots
+ACTIVE_STATUSES = ('scheduled', 'in_progress')
+DAY_MINUTES = 24 * 60
+# How far ahead a new recurring series is checked against hours and capacity
+RECURRENCE_CHECK_DAYS = 365
+
+_DAY_NAMES = ('mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun')
+_DAY_GROUPS = {
+    'daily': range(7), 'everyday': range(7),
+    'weekdays': range(5), 'weekday': range(5),
+    'weekends': range(5, 7), 'weekend': range(5, 7),
+}
+_TIME = r'\d{1,2}(?::\d{2})?\s*(?:[ap]\.?m\.?)?'
+_HOURS_PATTERN = re.compile(
+    rf'(?:(?P<days>[a-z]+(?:\s*(?:-|–|to)\s*[a-z]+)?)\s*:?\s*)?'
+    rf'(?P<open>{_TIME})\s*(?:-|–|to)\s*(?P<close>{_TIME})'
+)
+
+
+def _parse_day(name):
+    for index, day in enumerate(_DAY_NAMES):
+        if name.startswith(day):
+            return index
+    raise ValueError(f'Unknown day {name!r}')
+
+
+def _parse_days(text):
+    if not text:
+        return range(7)
+    if text in _DAY_GROUPS:
+        return _DAY_GROUPS[text]
+    parts = re.split(r'\s*(?:-|–|to)\s*', text)
+    first, last = _parse_day(parts[0]), _parse_day(parts[-1])
+    return [(first + offset) % 7 for offset in range((last - first) % 7 + 1)]
+
+
+def _parse_minutes(text):
+    match = re.fullmatch(r'(\d{1,2})(?::(\d{2}))?\s*(?:([ap])\.?m\.?)?', text.strip())
+    hour, minute, meridiem = int(match.group(1)), int(match.group(2) or 0), match.group(3)
+    if meridiem:
+        hour = hour % 12 + (12 if meridiem == 'p' else 0)
+    if minute > 59 or hour * 60 + minute > DAY_MINUTES:
+        raise ValueError(f'Invalid time {text!r}')
+    return hour * 60 + minute
+
+
+def parse_operating_hours(text):
+    """Parse free-text hours such as 'Mon-Fri: 8:00 AM - 5:00 PM' into weekly windows
+
+    Returns {weekday: [(open_minute, close_minute)]} with Monday as 0, or None
+    when the provider has no hours set or is open around the clock. Windows
+    that run past midnight are split across the two days. Raises ValueError
+    when the text cannot be understood.
+    """
+    if not text or not text.strip():
+        return None
+    text = text.strip().lower()
+    if text in ('24/7', '24x7', '24 hours', 'always'):
+        return None
+
+    windows = {day: [] for day in range(7)}
+    matches = list(_HOURS_PATTERN.finditer(text))
+    if not matches:
+        raise ValueError(f'Unrecognised operating hours {text!r}')
+    for match in matches:
+        opens, closes = _parse_minutes(match.group('open')), _parse_minutes(match.group('close'))
+        for day in _parse_days(match.group('days')):
+            if closes > opens:
+                windows[day].append((opens, closes))
+            else:
+                windows[day].append((opens, DAY_MINUTES))
+                if closes:
+                    windows[(day + 1) % 7].append((0, closes))
+    return {day: sorted(spans) for day, spans in windows.items()}
+
+
+def provider_hours(provider):
+    """The provider's weekly windows, or None when hours are unset or unreadable
+
+    operating_hours predates capacity rules and is free text, so hours that
+    cannot be parsed are not enforced rather than blocking every booking.
+    """
+    try:
+        return parse_operating_hours(provider.operating_hours)
+    except ValueError:
+        return None
+
+
+def open_windows(hours, start, end):
+    """Yield the (opens_at, closes_at) datetimes of the provider's hours within [start, end)
+
+    Touching or overlapping windows, including ones split at midnight, are
+    merged so a booking may run across them.
+    """
+    if hours is None:
+        if start < end:
+            yield start, end
+        return
+    current = None
+    day = datetime.combine(start.date(), datetime.min.time())
+    while day < end:
+        for opens, closes in hours[day.weekday()]:
+            opens_at = max(day + timedelta(minutes=opens), start)
+            closes_at = min(day + timedelta(minutes=closes), end)
+            if opens_at >= closes_at:
+                continue
+            if current and opens_at <= current[1]:
+                current = (current[0], max(current[1], closes_at))
+                continue
+            if current:
+                yield current
+            current = (opens_at, closes_at)
+        day += timedelta(days=1)
+    if current:
+        yield current
+
+
+def within_hours(hours, starts_at, ends_at):
+    """Whether [starts_at, ends_at) falls inside a single opening window"""
+    if hours is None:
+        return True
+    # Widen the search by a day each side so windows merged across midnight are whole
+    return any(opens_at <= starts_at and ends_at <= closes_at
+               for opens_at, closes_at in open_windows(hours, starts_at - timedelta(days=1),
+                                                       ends_at + timedelta(days=1)))
+
+
+def schedule_interval(scheduled_date, scheduled_time, duration_minutes):
+    starts_at = datetime.combine(scheduled_date.date(), scheduled_time)
+    return starts_at, starts_at + timedelta(minutes=duration_minutes)
+
+
+class Occupancy:
+    """Step function of how many jobs a provider runs at once over a period
+
+    Built from the provider's bookings by a sweep over their start and end
+    points: levels[i] jobs run from points[i] until points[i + 1]. The peak
+    over any interval is a bisect plus a walk over the breakpoints inside it.
+    """
+
+    def __init__(self, bookings):
+        edges = {}
+        for starts_at, ends_at in bookings:
+            edges[starts_at] = edges.get(starts_at, 0) + 1
+            edges[ends_at] = edges.get(ends_at, 0) - 1
+        self.points, self.levels = [], []
+        level = 0
+        for point in sorted(edges):
+            level += edges[point]
+            self.points.append(point)
+            self.levels.append(level)
+
+    def peak(self, start, end):
+        """Most jobs running at any moment in [start, end)"""
+        index = bisect_right(self.points, start) - 1
+        peak = self.levels[index] if index >= 0 else 0
+        for index in range(index + 1, len(self.points)):
+            if self.points[index] >= end:
+                break
+            peak = max(peak, self.levels[index])
+        return peak
+
+
+def schedules_in_window(provider_id, start, end, statuses=None):
+    """One-off schedules and recurring series of a provider that can have occurrences in [start, end)
+
+    One range read over the (provider_id, status, ends_at) index; a series
+    carries the end of its last occurrence in ends_at, or NULL if open-ended.
+    """
+    query = ServiceSchedule.query.filter(
+        ServiceSchedule.provider_id == provider_id,
+        ServiceSchedule.starts_at < end,
+        or_(ServiceSchedule.ends_at > start,
+            and_(ServiceSchedule.recurrence.isnot(None), ServiceSchedule.ends_at.is_(None)))
+    )
+    if statuses:
+        query = query.filter(ServiceSchedule.status.in_(statuses))
+    return query.order_by(ServiceSchedule.starts_at).all()
+
+
+def _occurrence(schedule, occurrence_start, starts_at, ends_at, exception=None):
+    return {
+        'schedule_id': schedule.id,
+        'service_id': schedule.service_id,
+        'occurrence_start': occurrence_start,
+        'starts_at': starts_at,
+        'ends_at': ends_at,
+        'status': (exception.status if exception and exception.status else schedule.status),
+        'recurring': bool(schedule.recurrence),
+        'notes': exception.notes if exception else None
+    }
+
+
+def expand_occurrences(schedules, start, end):
+    """Expand schedules into occurrence dicts intersecting [start, end), earliest first
+
+    Recurring series are generated only for the window, and their sparse
+    exceptions are fetched with one indexed read, so the cost follows the
+    number of visible occurrences rather than the length of each series.
+    """
+    series = [schedule for schedule in schedules if schedule.recurrence]
+    exceptions = {}
+    if series:
+        widest = timedelta(minutes=max(schedule.duration_minutes for schedule in series))
+        rows = ScheduleException.query.filter(
+            ScheduleException.schedule_id.in_([schedule.id for schedule in series]),
+            or_(and_(ScheduleException.occurrence_start > start - widest,
+                     ScheduleException.occurrence_start < end),
+                and_(ScheduleException.starts_at < end, ScheduleException.ends_at > start))
+        ).all()
+        exceptions = {(row.schedule_id, row.occurrence_start): row for row in rows}
+
+    occurrences, seen = [], set()
+    for schedule in schedules:
+        if not schedule.recurrence:
+            occurrences.append(_occurrence(schedule, schedule.starts_at, schedule.starts_at, schedule.ends_at))
+            continue
+        duration = timedelta(minutes=schedule.duration_minutes)
+        for occurrence_start in iter_starts(parse_rule(schedule.recurrence), schedule.starts_at, after=start - duration):
+            if occurrence_start >= end:
+                break
+            exception = exceptions.get((schedule.id, occurrence_start))
+            seen.add((schedule.id, occurrence_start))
+            starts_at, ends_at = occurrence_start, occurrence_start + duration
+            if exception and exception.starts_at:
+                starts_at, ends_at = exception.starts_at, exception.ends_at
+            if starts_at < end and ends_at > start:
+                occurrences.append(_occurrence(schedule, occurrence_start, starts_at, ends_at, exception))
+
+    # Occurrences moved into the window from outside it
+    by_id = {schedule.id: schedule for schedule in series}
+    for key, exception in exceptions.items():
+        if key not in seen and exception.starts_at and exception.starts_at < end and exception.ends_at > start:
+            occurrences.append(_occurrence(by_id[key[0]], key[1], exception.starts_at, exception.ends_at, exception))
+
+    occurrences.sort(key=lambda occurrence: (occurrence['starts_at'], occurrence['schedule_id']))
+    return occurrences
+
+
+def format_occurrence(occurrence):
+    return {key: value.isoformat() if isinstance(value, datetime) else value for key, value in occurrence.items()}
+
+
+def booked_occurrences(provider_id, start, end, ignore=None):
+    """Occurrences in [start, end) that hold one of the provider's job slots
+
+    ignore is a (schedule_id, occurrence_start) pair left out of the result,
+    so an occurrence being moved does not collide with itself.
+    """
+    return [
+        occurrence
+        for occurrence in expand_occurrences(schedules_in_window(provider_id, start, end, ACTIVE_STATUSES), start, end)
+        if occurrence['status'] in ACTIVE_STATUSES
+        and (occurrence['schedule_id'], occurrence['occurrence_start']) != ignore
+    ]
+
+
+def capacity_conflicts(provider, intervals, ignore=None):
+    """Check (starts_at, ends_at) intervals against the provider's hours and job limit
+
+    Returns (error, conflicting occurrences); error is None when every
+    interval can be booked. Existing bookings are read once for the whole span.
+    """
+    if not intervals:
+        return None, []
+    hours = provider_hours(provider)
+    if not all(within_hours(hours, starts_at, ends_at) for starts_at, ends_at in intervals):
+        return "Requested time is outside the provider's operating hours", []
+
+    start, end = min(starts_at for starts_at, _ in intervals), max(ends_at for _, ends_at in intervals)
+    booked = booked_occurrences(provider.id, start, end, ignore)
+    occupancy = Occupancy((occurrence['starts_at'], occurrence['ends_at']) for occurrence in booked)
+    full = [(starts_at, ends_at) for starts_at, ends_at in intervals
+            if occupancy.peak(starts_at, ends_at) >= provider.max_concurrent_jobs]
+    if not full:
+        return None, []
+    conflicts = [occurrence for occurrence in booked
+                 if any(occurrence['starts_at'] < ends_at and occurrence['ends_at'] > starts_at
+                        for starts_at, ends_at in full)]
+    return 'Provider is fully booked for part of this time', conflicts
+
+
+def open_slots(provider, start, end, duration_minutes, step_minutes):
+    """Return (starts_at, ends_at, remaining) for every bookable slot in [start, end)
+
+    Candidate slots start every step_minutes inside the provider's opening
+    windows; one range read fetches the bookings they are checked against.
+    """
+    hours = provider_hours(provider)
+    duration, step = timedelta(minutes=duration_minutes), timedelta(minutes=step_minutes)
+    occupancy = Occupancy((occurrence['starts_at'], occurrence['ends_at'])
+                          for occurrence in booked_occurrences(provider.id, start, end))
+    slots = []
+    for opens_at, closes_at in open_windows(hours, start, end):
+        slot = opens_at
+        while slot + duration <= closes_at:
+            remaining = provider.max_concurrent_jobs - occupancy.peak(slot, slot + duration)
+            if remaining > 0:
+                slots.append((slot, slot + duration, remaining))
+            slot += step
+    return slots
+
+
+def backfill_schedule_intervals(batch_size=1000):
+    """Fill starts_at/ends_at on schedules written before they were tracked"""
+    rows = (db.session.query(ServiceSchedule.id, ServiceSchedule.scheduled_date,
+                             ServiceSchedule.scheduled_time, ServiceSchedule.duration_minutes)
+            .filter(ServiceSchedule.starts_at.is_(None))
+            .all())
+    for start in range(0, len(rows), batch_size):
+        values = []
+        for schedule_id, scheduled_date, scheduled_time, duration in rows[start:start + batch_size]:
+            starts_at, ends_at = schedule_interval(scheduled_date, scheduled_time, duration or 60)
+            values.append({'b_id': schedule_id, 'starts_at': starts_at, 'ends_at': ends_at})
+        db.session.execute(
+            update(ServiceSchedule.__table__)
+            .where(ServiceSchedule.__table__.c.id == bindparam('b_id'))
+            .values(starts_at=bindparam('starts_at'), ends_at=bindparam('ends_at')),
+            values
+        )
+    db.session.commit()
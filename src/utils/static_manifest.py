@@ -0,0 +1,112 @@
+import hashlib
+import mimetypes
+import os
+import posixpath
+import re
+from flask import Response, request
+from src.utils.compression import available_encodings, encode, is_compressible, negotiate
+
+# Files larger than this stay on disk and are sent from there uncompressed
+MAX_CACHED_SIZE = 5 * 1024 * 1024
+IMMUTABLE = 'public, max-age=31536000, immutable'
+REVALIDATE = 'no-cache'
+# src/href attributes in HTML; external URLs never match a file and are left alone
+REFERENCE = re.compile(rb'(\b(?:src|href)\s*=\s*["\'])([^"\'#?:]+)(["\'])', re.IGNORECASE)
+
+
+class StaticFile:
+    """One file from the static folder with its content hash and precompressed variants"""
+
+    def __init__(self, path, data):
+        self.path = path
+        self.mimetype = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        self.hash = hashlib.sha256(data).hexdigest()[:12]
+        self.variants = {None: data}
+        if is_compressible(self.mimetype):
+            for encoding in available_encodings():
+                encoded = encode(data, encoding, best=True)
+                if len(encoded) < len(data):
+                    self.variants[encoding] = encoded
+
+    @property
+    def hashed_name(self):
+        """The fingerprinted name, e.g. app.3f2a9c1b0d4e.js, which is served as immutable"""
+        root, ext = os.path.splitext(self.path)
+        return f'{root}.{self.hash}{ext}'
+
+
+class StaticManifest:
+    """Everything under the static folder, read and compressed once at startup
+
+    Each file answers at its own path with Cache-Control: no-cache and its
+    content hash as ETag, so revalidation is a 304, and at its fingerprinted
+    name with a one-year immutable Cache-Control. The HTML pages are
+    rewritten to load their scripts, styles and images by fingerprinted
+    name, so browsers cache those for good and fetch anew after a deploy.
+    """
+
+    def __init__(self):
+        self.files = {}
+        self.immutable = {}
+        self.large = {}
+
+    def build(self, folder):
+        self.files, self.immutable, self.large = {}, {}, {}
+        if not folder or not os.path.isdir(folder):
+            return self
+        for root, _, names in os.walk(folder):
+            for name in names:
+                full_path = os.path.join(root, name)
+                path = os.path.relpath(full_path, folder).replace(os.sep, '/')
+                if os.path.getsize(full_path) > MAX_CACHED_SIZE:
+                    self.large[path] = full_path
+                    continue
+                with open(full_path, 'rb') as f:
+                    static_file = StaticFile(path, f.read())
+                self.files[path] = static_file
+        for path, static_file in list(self.files.items()):
+            if static_file.mimetype == 'text/html':
+                self.files[path] = StaticFile(path, self._fingerprint_references(path, static_file.variants[None]))
+        self.immutable = {static_file.hashed_name: static_file for static_file in self.files.values()}
+        return self
+
+    def _fingerprint_references(self, page, html):
+        """Point page's references to other static files at their fingerprinted names"""
+        folder = posixpath.dirname(page)
+
+        def fingerprint(match):
+            reference = match.group(2).decode()
+            target = posixpath.normpath(posixpath.join(folder, reference)).lstrip('/')
+            static_file = self.files.get(target)
+            # Pages are navigated to by their plain paths, so only their assets are rewritten
+            if static_file is None or static_file.mimetype == 'text/html':
+                return match.group(0)
+            hashed = posixpath.join(posixpath.dirname(reference), posixpath.basename(static_file.hashed_name))
+            return match.group(1) + hashed.encode() + match.group(3)
+
+        return REFERENCE.sub(fingerprint, html)
+
+    def lookup(self, path):
+        """Return (file, immutable) for a request path, or (None, False)"""
+        if path in self.files:
+            return self.files[path], False
+        if path in self.immutable:
+            return self.immutable[path], True
+        return None, False
+
+    def respond(self, static_file, immutable=False):
+        """A response for static_file in the best encoding the client accepts"""
+        # Weak, since the same tag covers every encoding of the file
+        headers = {'ETag': f'W/"{static_file.hash}"', 'Cache-Control': IMMUTABLE if immutable else REVALIDATE}
+        if is_compressible(static_file.mimetype):
+            headers['Vary'] = 'Accept-Encoding'
+        if request.if_none_match.contains_weak(static_file.hash):
+            return Response(status=304, headers=headers)
+
+        encoding = negotiate([coding for coding in static_file.variants if coding])
+        if encoding:
+            headers['Content-Encoding'] = encoding
+        return Response(static_file.variants[encoding], mimetype=static_file.mimetype, headers=headers)
+
+
+static_manifest = StaticManifest()
@@ -0,0 +1,6 @@
+# Patch before anything else imports threading or queue, so the event
+# broker's lock and the stream queues are cooperative (see gunicorn.conf.py)
+from gevent import monkey
+monkey.patch_all()
+
+from src.main import app  # noqa: E402